@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional
-from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
 from core.database import get_db
 from services.auth_service import auth_service
 from api.deps import get_current_user
@@ -28,6 +29,19 @@ class PasswordChange(BaseModel):
     old_password: str
     new_password: str
 
+class UserMe(BaseModel):
+    id: int
+    email: str
+    created_at: Optional[datetime] = None
+    preferences: Dict[str, Any] = {}
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator("preferences", mode="before")
+    @classmethod
+    def default_preferences(cls, value):
+        return value or {}
+
 class UserPreferences(BaseModel):
     tts_provider: str = "elevenlabs"
     auto_play_tts: bool = False
@@ -54,17 +68,10 @@ def login(user_in: UserLogin, db: Session = Depends(get_db)):
         )
     return result
 
-@router.get("/me")
+@router.get("/me", response_model=UserMe)
 def read_users_me(current_user: User = Depends(get_current_user)):
     """Get current user data"""
-    return {
-        "id": current_user.id,
-        "email": current_user.email,
-        "id": current_user.id,
-        "email": current_user.email,
-        "created_at": current_user.created_at,
-        "preferences": current_user.preferences or {}
-    }
+    return UserMe.model_validate(current_user)
 
 @router.put("/preferences")
 def update_preferences(
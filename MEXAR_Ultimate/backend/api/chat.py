@@ -90,7 +90,8 @@ async def chat_json(
         
         result = engine.reason(
             agent_name=agent.name,
-            query=request.message
+            query=request.message,
+            db=db
         )
         
         response = {
@@ -277,6 +278,7 @@ async def chat_multimodal(
         result = engine.reason(
             agent_name=agent.name,
             query=message,
+            db=db,
             multimodal_context=multimodal_context
         )
 
@@ -409,9 +411,9 @@ async def generate_tts(
 @router.get("/tts/audio/{filename}")
 async def serve_tts_audio(filename: str):
     """Serve cached TTS audio files."""
-    audio_path = Path("data/tts_cache") / filename
+    audio_path = get_tts_service().find_cached(Path(filename).stem)
     
-    if not audio_path.exists():
+    if audio_path is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
     
     return FileResponse(
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from modules.prompt_analyzer import create_prompt_analyzer, get_prompt_templates
+from modules.prompt_analyzer import get_prompt_analyzer, get_prompt_templates
 
 router = APIRouter(prefix="/api", tags=["prompts"])
 
@@ -20,8 +20,7 @@ async def get_templates():
 async def analyze_prompt_endpoint(request: AnalyzeRequest):
     """Analyze a system prompt to extract domain and metadata."""
     try:
-        analyzer = create_prompt_analyzer()
-        analysis = analyzer.analyze_prompt(request.prompt)
+        analysis = get_prompt_analyzer().analyze_prompt(request.prompt)
         return {"analysis": analysis}
     except Exception as e:
         # Fallback is handled inside analyze_prompt, but just in case
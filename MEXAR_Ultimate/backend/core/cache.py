@@ -1,87 +1,276 @@
 
-from functools import lru_cache
-from datetime import datetime, timedelta
-from typing import Any, Optional, Dict
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Dict, Tuple
+import heapq
 import threading
+import time
+
+import numpy as np
+
+# Marks a missing key so dict.pop can report absence in a single lookup
+_SENTINEL = object()
+
 
 class InMemoryCache:
     """
     Simple in-memory cache with TTL support.
     Replaces Redis for development environments.
+    
+    Entries are (value, expires_at) tuples, where expires_at is a
+    time.monotonic() deadline or None for entries that never expire.
+    At most `maxsize` entries are kept; the least recently used is evicted.
     """
     
-    def __init__(self, default_ttl: int = 3600):
-        self._cache: Dict[str, dict] = {}
+    def __init__(self, default_ttl: int = 3600, maxsize: int = 10_000):
+        # Kept in LRU order: least recently used first
+        self._cache: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._maxsize = maxsize
+        # Min-heap of (expires_at, key); entries go stale when a key is
+        # re-set, deleted or evicted, are skipped when popped, and are
+        # dropped by compaction once they outnumber the live ones
+        self._expiry_heap: List[Tuple[float, str]] = []
         self._default_ttl = default_ttl
-        self._lock = threading.RLock()
+        # One plain lock: every get() reorders the LRU, so reads mutate too
+        self._lock = threading.Lock()
+        # Concurrent misses on the same key share one producer call
+        self._inflight = SingleFlight()
     
     def get(self, key: str) -> Optional[Any]:
         """Get a value from cache."""
         with self._lock:
-            if key not in self._cache:
+            entry = self._cache.get(key)
+            if entry is None:
                 return None
             
-            entry = self._cache[key]
+            value, expires_at = entry
             
             # Check if expired
-            if entry['expires_at'] and datetime.utcnow() > entry['expires_at']:
+            if expires_at is not None and expires_at < time.monotonic():
                 del self._cache[key]
                 return None
             
-            return entry['value']
+            self._cache.move_to_end(key)
+            return value
     
     def set(self, key: str, value: Any, ttl: int = None) -> None:
         """Set a value in cache with optional TTL."""
+        ttl = ttl if ttl is not None else self._default_ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        
         with self._lock:
-            ttl = ttl if ttl is not None else self._default_ttl
-            expires_at = datetime.utcnow() + timedelta(seconds=ttl) if ttl > 0 else None
-            
-            self._cache[key] = {
-                'value': value,
-                'expires_at': expires_at,
-                'created_at': datetime.utcnow()
-            }
+            self._cache[key] = (value, expires_at)
+            self._cache.move_to_end(key)
+            if expires_at is not None:
+                heapq.heappush(self._expiry_heap, (expires_at, key))
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+            # Reap as we go so abandoned keys don't accumulate
+            self._reap_expired(time.monotonic())
+            self._compact_expiry_heap()
+    
+    def get_or_compute(self, key: str, producer: Callable[[], Any], ttl: int = None) -> Any:
+        """
+        Get a value, computing and caching it on a miss.
+        
+        Concurrent misses for the same key wait for a single producer call
+        instead of each running it. None results are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        def compute() -> Any:
+            # Another caller may have filled the key just before we got here
+            value = self.get(key)
+            if value is None:
+                value = producer()
+                if value is not None:
+                    self.set(key, value, ttl)
+            return value
+        
+        return self._inflight.do(key, compute)
     
     def delete(self, key: str) -> bool:
         """Delete a key from cache."""
         with self._lock:
-            if key in self._cache:
+            return self._cache.pop(key, _SENTINEL) is not _SENTINEL
+    
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with prefix (a full scan) and return the count."""
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
                 del self._cache[key]
-                return True
-            return False
+            return len(keys)
     
     def clear(self) -> None:
         """Clear all cache entries."""
         with self._lock:
             self._cache.clear()
+            self._expiry_heap.clear()
     
     def exists(self, key: str) -> bool:
         """Check if key exists and is not expired."""
         return self.get(key) is not None
     
     def get_stats(self) -> dict:
-        """Get cache statistics."""
+        """Get cache statistics (expired entries are reaped while counting)."""
         with self._lock:
-            now = datetime.utcnow()
-            active = sum(1 for e in self._cache.values() 
-                        if not e['expires_at'] or e['expires_at'] > now)
+            expired = self._reap_expired(time.monotonic())
+            active = len(self._cache)
             return {
-                'total_keys': len(self._cache),
+                'total_keys': active + expired,
                 'active_keys': active,
-                'expired_keys': len(self._cache) - active
+                'expired_keys': expired
             }
     
     def cleanup(self) -> int:
         """Remove expired entries and return count removed."""
         with self._lock:
-            now = datetime.utcnow()
-            expired_keys = [
-                k for k, v in self._cache.items() 
-                if v['expires_at'] and v['expires_at'] < now
-            ]
-            for key in expired_keys:
+            return self._reap_expired(time.monotonic())
+    
+    def _compact_expiry_heap(self) -> None:
+        """
+        Rebuild the heap from live deadlines once stale entries dominate it,
+        keeping it proportional to the cache rather than to the set rate.
+        Caller holds the lock.
+        """
+        if len(self._expiry_heap) <= 2 * len(self._cache) + 64:
+            return
+        self._expiry_heap = [
+            (expires_at, key)
+            for key, (_, expires_at) in self._cache.items()
+            if expires_at is not None
+        ]
+        heapq.heapify(self._expiry_heap)
+    
+    def _reap_expired(self, now: float) -> int:
+        """Pop expired deadlines off the heap; caller holds the lock."""
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] < now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            # Skip stale heap entries for keys re-set with a new deadline
+            if entry is not None and entry[1] == expires_at:
                 del self._cache[key]
-            return len(expired_keys)
+                removed += 1
+        return removed
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+    The first caller runs the producer; callers arriving while it is
+    in flight wait for and share its result (or exception).
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: str, producer: Callable[[], Any]) -> Any:
+        """Run producer for key, or wait on the call already in flight."""
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not is_leader:
+            return future.result()
+        
+        try:
+            result = producer()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class SemanticCache:
+    """
+    Similarity-keyed cache for expensive text -> result computations.
+    
+    A lookup hits when some stored key's embedding has cosine similarity of
+    at least `threshold` with the query's, so near-identical texts share one
+    result. At most `maxsize` entries are kept; the oldest is evicted first.
+    If `embed` fails the cache behaves as always-miss.
+    """
+    
+    def __init__(
+        self,
+        embed: Callable[[str], Any],
+        threshold: float = 0.95,
+        maxsize: int = 256
+    ):
+        self._embed = embed
+        self.threshold = threshold
+        self._maxsize = maxsize
+        # Row i of _vectors is the unit embedding of the key behind _values[i]
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        self._lock = threading.Lock()
+    
+    def _unit_vector(self, key: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self._embed(key), dtype=np.float32)
+        except Exception:
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _best_match(self, vector: np.ndarray) -> Optional[int]:
+        """Index of the closest stored entry above threshold (lock held)."""
+        if self._vectors is None:
+            return None
+        scores = self._vectors @ vector
+        best = int(scores.argmax())
+        return best if scores[best] >= self.threshold else None
+    
+    def lookup(self, key: str) -> Optional[Any]:
+        """Return the value stored for a key similar to `key`, or None."""
+        with self._lock:
+            if not self._values:
+                return None
+        vector = self._unit_vector(key)
+        if vector is None:
+            return None
+        with self._lock:
+            best = self._best_match(vector)
+            return self._values[best] if best is not None else None
+    
+    def update(self, key: str, value: Any) -> None:
+        """Store value under key, replacing an entry similar enough to match it."""
+        vector = self._unit_vector(key)
+        if vector is None:
+            return
+        with self._lock:
+            best = self._best_match(vector)
+            if best is not None:
+                self._values[best] = value
+                self._vectors[best] = vector
+                return
+            if self._vectors is None:
+                self._vectors = vector[np.newaxis, :]
+            else:
+                # Evict the oldest entries to make room
+                drop = max(0, len(self._values) + 1 - self._maxsize)
+                self._vectors = np.vstack((self._vectors[drop:], vector))
+                self._values = self._values[drop:]
+            self._values.append(value)
+    
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._vectors = None
+            self._values = []
 
 
 # Singleton instance
@@ -93,15 +282,50 @@ def cache_agent_artifacts(agent_id: int, artifacts: dict, ttl: int = 3600):
     """Cache agent artifacts (knowledge graph, etc.)"""
     cache.set(f"agent:{agent_id}:artifacts", artifacts, ttl)
 
-def get_cached_agent_artifacts(agent_id: int) -> Optional[dict]:
-    """Get cached agent artifacts."""
-    return cache.get(f"agent:{agent_id}:artifacts")
+def get_cached_agent_artifacts(
+    agent_id: int,
+    loader: Optional[Callable[[], dict]] = None,
+    ttl: int = 3600
+) -> Optional[dict]:
+    """
+    Get cached agent artifacts.
+    
+    If a loader is given, a miss is filled by calling it once, even when
+    many requests miss at the same time.
+    """
+    key = f"agent:{agent_id}:artifacts"
+    if loader is None:
+        return cache.get(key)
+    return cache.get_or_compute(key, loader, ttl)
 
 def invalidate_agent_cache(agent_id: int):
     """Invalidate all cache entries for an agent."""
     cache.delete(f"agent:{agent_id}:artifacts")
     cache.delete(f"agent:{agent_id}:engine")
 
+def get_cached_agent_data(agent_name: str, loader: Callable[[], dict], ttl: int = 300) -> dict:
+    """
+    Get an agent's reasoning data by name.
+    A miss is filled by calling the loader once, even under concurrent requests.
+    """
+    return cache.get_or_compute(f"agent_name:{agent_name}:data", loader, ttl)
+
+def invalidate_agent_data(agent_name: str, agent_id: int):
+    """
+    Drop an agent's cached reasoning data and answers (after recompiling or
+    deleting it), so nothing is served from its old knowledge base.
+    """
+    cache.delete(f"agent_name:{agent_name}:data")
+    cache.delete_prefix(f"agent:{agent_id}:answer:")
+
+def cache_answer(agent_id: int, inputs_hash: str, answer: dict, ttl: int = 600):
+    """Cache a full reasoning result for an agent (short TTL, answers go stale on recompile)."""
+    cache.set(f"agent:{agent_id}:answer:{inputs_hash}", answer, ttl)
+
+def get_cached_answer(agent_id: int, inputs_hash: str) -> Optional[dict]:
+    """Get a cached reasoning result for an agent."""
+    return cache.get(f"agent:{agent_id}:answer:{inputs_hash}")
+
 def cache_user_agents(user_id: int, agents: list, ttl: int = 60):
     """Cache user's agent list for quick dashboard loading."""
     cache.set(f"user:{user_id}:agents", agents, ttl)
@@ -111,12 +335,11 @@ def get_cached_user_agents(user_id: int) -> Optional[list]:
     return cache.get(f"user:{user_id}:agents")
 
 
-# LRU Cache for expensive computations
-@lru_cache(maxsize=100)
-def cached_domain_analysis(prompt_hash: str) -> dict:
+# Cache for expensive computations
+def cached_domain_analysis(prompt_hash: str, analyze: Callable[[], dict], ttl: int = 3600) -> dict:
     """
-    LRU cache for domain analysis results.
-    Use hash of prompt as key to avoid storing full prompts.
+    Cache domain analysis results.
+    Use hash of prompt as key to avoid storing full prompts; concurrent
+    misses for the same prompt run the analysis only once.
     """
-    # This is a placeholder - actual analysis happens in prompt_analyzer
-    return {}
+    return cache.get_or_compute(f"domain_analysis:{prompt_hash}", analyze, ttl)
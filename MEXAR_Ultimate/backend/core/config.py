@@ -16,6 +16,9 @@ class Config:
     # AI Services
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
     
+    # Reranker runtime: "auto" (CUDA FP16, else INT8 ONNX), "cuda", "onnx" or "torch"
+    RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "auto").lower()
+    
     # Storage
     STORAGE_PATH = os.getenv("STORAGE_PATH", "./data/storage")
     
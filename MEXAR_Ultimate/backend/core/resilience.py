@@ -0,0 +1,151 @@
+"""
+MEXAR Core Engine - Resilience helpers for outbound HTTP calls.
+Short exponential-backoff retries plus a per-provider circuit breaker.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+import httpx
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying (rate limited or transient server errors)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Keep the retry budget short so permanent failures don't inflate tail latency
+MAX_ATTEMPTS = 3
+MAX_RETRY_WAIT = 2.0
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit is open and calls are short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Minimal consecutive-failure circuit breaker.
+    Opens after `failure_threshold` failures in a row and rejects calls
+    until `reset_timeout` seconds have passed, then lets a trial call through.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the circuit is open."""
+        with self._lock:
+            if self._failures < self.failure_threshold:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Half-open: allow one trial call through
+                self._opened_at = time.monotonic()
+                return
+        raise CircuitOpenError(f"{self.name} circuit open, skipping call")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.failure_threshold:
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} failures")
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func through the breaker, counting any exception as a failure."""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Get or create the circuit breaker for a provider."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            breaker = _breakers[provider] = CircuitBreaker(provider)
+        return breaker
+
+
+_backoff = wait_exponential_jitter(initial=0.2, max=MAX_RETRY_WAIT)
+
+
+def _wait_backoff_or_retry_after(retry_state) -> float:
+    """Exponential jitter, stretched to honour a (capped) Retry-After header."""
+    delay = _backoff(retry_state)
+    outcome = retry_state.outcome
+    if outcome is not None and not outcome.failed:
+        retry_after = outcome.result().headers.get("Retry-After")
+        try:
+            delay = max(delay, min(float(retry_after), MAX_RETRY_WAIT))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def _is_retryable_response(response: httpx.Response) -> bool:
+    return response.status_code in RETRYABLE_STATUS
+
+
+@retry(
+    stop=stop_after_attempt(MAX_ATTEMPTS),
+    wait=_wait_backoff_or_retry_after,
+    retry=retry_if_exception_type(httpx.TransportError) | retry_if_result(_is_retryable_response),
+    # Out of attempts: hand back the last response (or re-raise its exception)
+    retry_error_callback=lambda retry_state: retry_state.outcome.result(),
+)
+def _send_with_retry(send: Callable[[], httpx.Response]) -> httpx.Response:
+    return send()
+
+
+def send_with_retry(provider: str, send: Callable[[], httpx.Response]) -> httpx.Response:
+    """
+    Execute an HTTP call with retries and the provider's circuit breaker.
+
+    Args:
+        provider: Provider name used to select the circuit breaker
+        send: Zero-argument callable performing the request
+
+    Returns:
+        The final httpx.Response (callers still inspect status codes)
+    """
+    breaker = get_circuit_breaker(provider)
+    breaker.before_call()
+
+    try:
+        response = _send_with_retry(send)
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    if response.status_code in RETRYABLE_STATUS:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
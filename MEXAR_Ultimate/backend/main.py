@@ -7,6 +7,7 @@ All endpoints are handled by the api/ modules.
 """
 
 import os
+import asyncio
 import logging
 from pathlib import Path
 from contextlib import asynccontextmanager
@@ -60,6 +61,27 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Database initialization: {e}")
     
+    # Search SQL needs the halfvec migrations; refuse to start without them
+    # instead of failing every query
+    from utils.hybrid_search import SearchSchemaError, verify_search_schema
+    try:
+        from core.database import engine
+        with engine.connect() as conn:
+            verify_search_schema(conn)
+    except SearchSchemaError:
+        logger.error("Database schema is out of date for search")
+        raise
+    except Exception as e:
+        logger.warning(f"Search schema check skipped: {e}")
+    
+    # Load the cross-encoder now so the first query doesn't pay for it
+    try:
+        from utils.reranker import warm_up_reranker
+        if await asyncio.to_thread(warm_up_reranker):
+            logger.info("Reranker warmed up")
+    except Exception as e:
+        logger.warning(f"Reranker warm-up: {e}")
+    
     yield
     logger.info("MEXAR Core Engine shutting down...")
 
@@ -0,0 +1,27 @@
+from core.database import engine
+from sqlalchemy import text, inspect
+
+from models.conversation import Message
+
+INDEX_NAME = "idx_messages_conversation_id"
+
+def run_migration():
+    table = Message.__table__.name
+    print(f"Running migration: Index {table}.conversation_id...")
+    inspector = inspect(engine)
+    indexed = [idx['column_names'] for idx in inspector.get_indexes(table)]
+    
+    if ['conversation_id'] not in indexed:
+        try:
+            with engine.connect() as conn:
+                # Message counts and history lookups filter/join on conversation_id
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {table} (conversation_id)"))
+                conn.commit()
+            print(f"✅ Successfully created '{INDEX_NAME}' on '{table}'.")
+        except Exception as e:
+            print(f"❌ Error creating index: {e}")
+    else:
+        print(f"ℹ️ '{table}.conversation_id' is already indexed.")
+
+if __name__ == "__main__":
+    run_migration()
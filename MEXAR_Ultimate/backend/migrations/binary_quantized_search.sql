@@ -0,0 +1,109 @@
+-- MEXAR - Binary Quantized Candidate Search
+-- Two-stage semantic retrieval: recall candidates by Hamming distance over
+-- 1-bit quantized embeddings (32x smaller than FP32, 16x smaller than halfvec),
+-- then rescore only those candidates with exact cosine distance.
+-- Run after halfvec_embeddings.sql. Requires pgvector >= 0.7.0.
+
+-- Step 1: Expression index over the binary-quantized embeddings
+CREATE INDEX IF NOT EXISTS chunks_embedding_bit_hnsw
+ON document_chunks USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Step 2: Recreate hybrid_search with binary recall + cosine rescoring
+CREATE OR REPLACE FUNCTION hybrid_search(
+    query_embedding halfvec(384),
+    query_text text,
+    match_agent_id integer,
+    match_count integer
+)
+RETURNS TABLE (
+    id integer,
+    agent_id integer,
+    content text,
+    source text,
+    chunk_index integer,
+    section_title text,
+    created_at timestamp with time zone,
+    rrf_score real
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    semantic_weight real := 0.6;
+    keyword_weight real := 0.4;
+    k_constant real := 60.0;
+    rescore_multiplier integer := 10;
+BEGIN
+    RETURN QUERY
+    WITH binary_candidates AS (
+        -- Stage 1: Hamming-distance recall over 1-bit codes (uses the bit index)
+        SELECT dc.id
+        FROM document_chunks dc
+        WHERE dc.agent_id = match_agent_id
+        ORDER BY binary_quantize(dc.embedding)::bit(384) <~> binary_quantize(query_embedding)::bit(384)
+        LIMIT match_count * rescore_multiplier
+    ),
+    semantic_search AS (
+        -- Stage 2: exact cosine rescoring of the candidates
+        SELECT
+            dc.id,
+            dc.agent_id,
+            dc.content,
+            dc.source,
+            dc.chunk_index,
+            dc.section_title,
+            dc.created_at,
+            ROW_NUMBER() OVER (ORDER BY dc.embedding <=> query_embedding) AS rank_num
+        FROM document_chunks dc
+        JOIN binary_candidates bc ON bc.id = dc.id
+        ORDER BY dc.embedding <=> query_embedding
+        LIMIT match_count * 2
+    ),
+    keyword_search AS (
+        SELECT
+            dc.id,
+            dc.agent_id,
+            dc.content,
+            dc.source,
+            dc.chunk_index,
+            dc.section_title,
+            dc.created_at,
+            ROW_NUMBER() OVER (ORDER BY ts_rank_cd(dc.content_tsvector, plainto_tsquery('english', query_text)) DESC) AS rank_num
+        FROM document_chunks dc
+        WHERE dc.agent_id = match_agent_id
+          AND dc.content_tsvector @@ plainto_tsquery('english', query_text)
+        ORDER BY ts_rank_cd(dc.content_tsvector, plainto_tsquery('english', query_text)) DESC
+        LIMIT match_count * 2
+    ),
+    combined AS (
+        SELECT 
+            COALESCE(s.id, k.id) AS id,
+            COALESCE(s.agent_id, k.agent_id) AS agent_id,
+            COALESCE(s.content, k.content) AS content,
+            COALESCE(s.source, k.source) AS source,
+            COALESCE(s.chunk_index, k.chunk_index) AS chunk_index,
+            COALESCE(s.section_title, k.section_title) AS section_title,
+            COALESCE(s.created_at, k.created_at) AS created_at,
+            (
+                COALESCE(semantic_weight / (k_constant + s.rank_num::real), 0.0) +
+                COALESCE(keyword_weight / (k_constant + k.rank_num::real), 0.0)
+            ) AS rrf_score
+        FROM semantic_search s
+        FULL OUTER JOIN keyword_search k ON s.id = k.id
+    )
+    SELECT 
+        c.id,
+        c.agent_id,
+        c.content,
+        c.source,
+        c.chunk_index,
+        c.section_title,
+        c.created_at,
+        c.rrf_score::real
+    FROM combined c
+    ORDER BY c.rrf_score DESC
+    LIMIT match_count;
+END;
+$$;
+
+COMMENT ON FUNCTION hybrid_search IS 'Combines semantic (vector) and keyword (full-text) search using Reciprocal Rank Fusion';
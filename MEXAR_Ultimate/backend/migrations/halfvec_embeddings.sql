@@ -0,0 +1,112 @@
+-- MEXAR - Store Embeddings as halfvec (FP16)
+-- Cosine scans over document_chunks.embedding are memory-bandwidth bound.
+-- halfvec(384) stores each embedding in half the bytes of vector(384)
+-- with negligible loss in cosine ranking quality.
+-- Requires pgvector >= 0.7.0 on the database.
+
+-- Step 1: Convert the column in place
+ALTER TABLE document_chunks
+ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384);
+
+-- Step 2: Rebuild the vector index with halfvec operators
+DROP INDEX IF EXISTS idx_document_chunks_embedding;
+DROP INDEX IF EXISTS chunks_embedding_hnsw;
+CREATE INDEX chunks_embedding_hnsw
+ON document_chunks USING hnsw (embedding halfvec_cosine_ops)
+WITH (m = 16, ef_construction = 64);
+
+-- Step 3: Recreate hybrid_search taking a halfvec query embedding
+DROP FUNCTION IF EXISTS hybrid_search(vector, text, integer, integer);
+
+CREATE OR REPLACE FUNCTION hybrid_search(
+    query_embedding halfvec(384),
+    query_text text,
+    match_agent_id integer,
+    match_count integer
+)
+RETURNS TABLE (
+    id integer,
+    agent_id integer,
+    content text,
+    source text,
+    chunk_index integer,
+    section_title text,
+    created_at timestamp with time zone,
+    rrf_score real
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    semantic_weight real := 0.6;
+    keyword_weight real := 0.4;
+    k_constant real := 60.0;
+BEGIN
+    RETURN QUERY
+    WITH semantic_search AS (
+        SELECT
+            dc.id,
+            dc.agent_id,
+            dc.content,
+            dc.source,
+            dc.chunk_index,
+            dc.section_title,
+            dc.created_at,
+            ROW_NUMBER() OVER (ORDER BY dc.embedding <=> query_embedding) AS rank_num
+        FROM document_chunks dc
+        WHERE dc.agent_id = match_agent_id
+        ORDER BY dc.embedding <=> query_embedding
+        LIMIT match_count * 2
+    ),
+    keyword_search AS (
+        SELECT
+            dc.id,
+            dc.agent_id,
+            dc.content,
+            dc.source,
+            dc.chunk_index,
+            dc.section_title,
+            dc.created_at,
+            ROW_NUMBER() OVER (ORDER BY ts_rank_cd(dc.content_tsvector, plainto_tsquery('english', query_text)) DESC) AS rank_num
+        FROM document_chunks dc
+        WHERE dc.agent_id = match_agent_id
+          AND dc.content_tsvector @@ plainto_tsquery('english', query_text)
+        ORDER BY ts_rank_cd(dc.content_tsvector, plainto_tsquery('english', query_text)) DESC
+        LIMIT match_count * 2
+    ),
+    combined AS (
+        SELECT 
+            COALESCE(s.id, k.id) AS id,
+            COALESCE(s.agent_id, k.agent_id) AS agent_id,
+            COALESCE(s.content, k.content) AS content,
+            COALESCE(s.source, k.source) AS source,
+            COALESCE(s.chunk_index, k.chunk_index) AS chunk_index,
+            COALESCE(s.section_title, k.section_title) AS section_title,
+            COALESCE(s.created_at, k.created_at) AS created_at,
+            (
+                COALESCE(semantic_weight / (k_constant + s.rank_num::real), 0.0) +
+                COALESCE(keyword_weight / (k_constant + k.rank_num::real), 0.0)
+            ) AS rrf_score
+        FROM semantic_search s
+        FULL OUTER JOIN keyword_search k ON s.id = k.id
+    )
+    SELECT 
+        c.id,
+        c.agent_id,
+        c.content,
+        c.source,
+        c.chunk_index,
+        c.section_title,
+        c.created_at,
+        c.rrf_score::real
+    FROM combined c
+    ORDER BY c.rrf_score DESC
+    LIMIT match_count;
+END;
+$$;
+
+COMMENT ON FUNCTION hybrid_search IS 'Combines semantic (vector) and keyword (full-text) search using Reciprocal Rank Fusion';
+
+-- Verify the change
+SELECT column_name, udt_name 
+FROM information_schema.columns 
+WHERE table_name = 'document_chunks' AND column_name = 'embedding';
@@ -3,13 +3,33 @@ MEXAR Core Engine - Explainability Generator Module
 Packages reasoning traces for UI display.
 """
 
+import re
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Citation file extension -> source type (single scan instead of one per type)
+_EXT_RE = re.compile(r"\.(csv|pdf|json|docx?)", re.IGNORECASE)
+_EXT_MAP = {
+    "csv": "csv",
+    "pdf": "pdf",
+    "json": "json",
+    "docx": "docx",
+    "doc": "docx"
+}
+
+# Reasoning action -> (display name, icon)
+_ACTION_META: Dict[str, Tuple[str, str]] = {
+    "domain_check": ("Domain Relevance Check", "✅"),
+    "vector_retrieval": ("Semantic Search", "🔍"),
+    "llm_generation": ("Answer Generation", "💬"),
+    "guardrail_rejection": ("Domain Guardrail", "🚫")
+}
+_DEFAULT_ACTION_ICON = "▶️"
+
 
 class ExplainabilityGenerator:
     """
@@ -120,40 +140,31 @@ class ExplainabilityGenerator:
         steps = []
         
         for item in trace:
+            action = item.get("action", "unknown")
+            action_display, icon = self._get_action_meta(action)
             step = {
                 "step_number": item.get("step", len(steps) + 1),
-                "action": item.get("action", "unknown"),
-                "action_display": self._get_action_display(item.get("action", "unknown")),
+                "action": action,
+                "action_display": action_display,
                 "explanation": item.get("explanation", ""),
-                "icon": self._get_action_icon(item.get("action", "unknown"))
+                "icon": icon
             }
             steps.append(step)
         
         return steps
     
-    def _get_action_display(self, action: str) -> str:
-        """Get display-friendly action name."""
-        action_map = {
-            "domain_check": "Domain Relevance Check",
-            "vector_retrieval": "Semantic Search",
-            "llm_generation": "Answer Generation",
-            "guardrail_rejection": "Domain Guardrail"
-        }
-        return action_map.get(action, action.replace("_", " ").title())
-    
-    def _get_action_icon(self, action: str) -> str:
-        """Get icon for reasoning action."""
-        icon_map = {
-            "domain_check": "✅",
-            "vector_retrieval": "🔍",
-            "llm_generation": "💬",
-            "guardrail_rejection": "🚫"
-        }
-        return icon_map.get(action, "▶️")
+    def _get_action_meta(self, action: str) -> Tuple[str, str]:
+        """Get display-friendly name and icon for a reasoning action."""
+        meta = _ACTION_META.get(action)
+        if meta is None:
+            return action.replace("_", " ").title(), _DEFAULT_ACTION_ICON
+        return meta
     
     def _format_confidence(self, breakdown: Dict) -> Dict[str, Any]:
         """Format confidence breakdown for display."""
         overall = breakdown.get("overall", 0)
+        domain_relevance = breakdown.get("domain_relevance", 0)
+        retrieval_quality = breakdown.get("retrieval_quality", 0)
         
         # Determine confidence level
         if overall >= 0.8:
@@ -178,14 +189,14 @@ class ExplainabilityGenerator:
             "factors": [
                 {
                     "name": "Domain Relevance",
-                    "score": breakdown.get("domain_relevance", 0),
-                    "percent": f"{breakdown.get('domain_relevance', 0) * 100:.0f}%",
+                    "score": domain_relevance,
+                    "percent": f"{domain_relevance * 100:.0f}%",
                     "description": "How well the query matches the agent's domain"
                 },
                 {
                     "name": "Retrieval Quality",
-                    "score": breakdown.get("retrieval_quality", 0),
-                    "percent": f"{breakdown.get('retrieval_quality', 0) * 100:.0f}%",
+                    "score": retrieval_quality,
+                    "percent": f"{retrieval_quality * 100:.0f}%",
                     "description": "Quality of retrieved context chunks"
                 }
             ]
@@ -207,20 +218,14 @@ class ExplainabilityGenerator:
     
     def _detect_source_type(self, source: str) -> str:
         """Detect the type of source citation."""
-        source_lower = source.lower()
+        match = _EXT_RE.search(source)
+        if match:
+            return _EXT_MAP[match.group(1).lower()]
         
-        if ".csv" in source_lower:
-            return "csv"
-        elif ".pdf" in source_lower:
-            return "pdf"
-        elif ".json" in source_lower:
-            return "json"
-        elif ".docx" in source_lower or ".doc" in source_lower:
-            return "docx"
-        elif "entry" in source_lower or "row" in source_lower:
+        source_lower = source.lower()
+        if "entry" in source_lower or "row" in source_lower:
             return "entry"
-        else:
-            return "text"
+        return "text"
     
     def _get_source_icon(self, source_type: str) -> str:
         """Get icon for source type."""
@@ -3,15 +3,206 @@ MEXAR Core Engine - System Prompt Configuration Module
 Analyzes system prompts to extract domain, personality, and constraints.
 """
 
-import json
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Any, Tuple
+import orjson
+from core.cache import SemanticCache, cached_domain_analysis
 from utils.groq_client import get_groq_client, GroqClient
+from utils.embedding_model import get_embedding_model
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Built-in system prompt templates, shared read-only by every caller
+_TEMPLATES: Tuple[Mapping[str, str], ...] = (
+    MappingProxyType({
+        "name": "Medical Assistant",
+        "domain": "medical",
+        "template": """You are a knowledgeable medical information assistant. 
+Your role is to provide accurate health information based on your knowledge base.
+You should be empathetic, professional, and always recommend consulting healthcare professionals for personal medical advice.
+Never provide diagnoses - only educational information."""
+    }),
+    MappingProxyType({
+        "name": "Legal Advisor",
+        "domain": "legal",
+        "template": """You are a legal information assistant providing general legal knowledge.
+Be professional and precise in your explanations.
+Always clarify that you provide educational information, not legal advice.
+Recommend consulting a licensed attorney for specific legal matters."""
+    }),
+    MappingProxyType({
+        "name": "Recipe Chef",
+        "domain": "cooking",
+        "template": """You are a friendly culinary assistant with expertise in cooking and recipes.
+Help users with cooking techniques, ingredient substitutions, and recipe adaptations.
+Be enthusiastic about food and encourage culinary exploration.
+Provide clear, step-by-step instructions when explaining recipes."""
+    }),
+    MappingProxyType({
+        "name": "Tech Support",
+        "domain": "technology",
+        "template": """You are a technical support specialist helping users with technology questions.
+Explain complex concepts in simple terms.
+Provide step-by-step troubleshooting guidance.
+Be patient and thorough in your explanations."""
+    }),
+    MappingProxyType({
+        "name": "Financial Guide",
+        "domain": "finance",
+        "template": """You are a financial information assistant providing educational content about personal finance.
+Be clear and professional when explaining financial concepts.
+Always remind users that this is educational information, not financial advice.
+Recommend consulting certified financial professionals for personal financial decisions."""
+    })
+)
+
+# Default keywords used to pad a known domain's keyword list
+_DOMAIN_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "medical": ("health", "patient", "doctor", "treatment", "diagnosis", "symptoms",
+                "medicine", "hospital", "disease", "therapy", "prescription", "clinic",
+                "medical", "healthcare", "wellness", "condition", "care", "physician",
+                "nurse", "medication"),
+    "legal": ("law", "court", "legal", "attorney", "lawyer", "case", "contract",
+              "rights", "litigation", "judge", "verdict", "lawsuit", "compliance",
+              "regulation", "statute", "defendant", "plaintiff", "trial", "evidence",
+              "testimony"),
+    "cooking": ("recipe", "cook", "ingredient", "food", "kitchen", "meal", "dish",
+                "flavor", "cuisine", "bake", "chef", "cooking", "taste", "serve",
+                "prepare", "dinner", "lunch", "breakfast", "snack", "dessert"),
+    "technology": ("software", "code", "programming", "computer", "system", "data",
+                   "network", "security", "cloud", "application", "development",
+                   "algorithm", "database", "API", "server", "hardware", "digital",
+                   "technology", "tech", "IT"),
+    "finance": ("money", "investment", "bank", "finance", "budget", "tax", "stock",
+                "credit", "loan", "savings", "financial", "accounting", "capital",
+                "asset", "portfolio", "market", "trading", "insurance", "wealth",
+                "income")
+}
+
+# Words that identify a domain when the LLM analysis is unavailable
+_DOMAIN_INDICATORS: Dict[str, FrozenSet[str]] = {
+    "medical": frozenset({"medical", "doctor", "patient", "health", "hospital", "treatment"}),
+    "legal": frozenset({"legal", "law", "attorney", "court", "contract", "rights"}),
+    "cooking": frozenset({"cook", "recipe", "food", "chef", "kitchen", "ingredient"}),
+    "technology": frozenset({"tech", "software", "code", "programming", "computer"}),
+    "finance": frozenset({"finance", "money", "bank", "investment", "budget"})
+}
+
+# Indicator word -> (table position, domain), so one pass over the prompt finds
+# every domain hit and the earliest domain in the table still wins ties
+_INDICATOR_INDEX: Dict[str, Tuple[int, str]] = {
+    indicator: (rank, domain)
+    for rank, (domain, indicators) in enumerate(_DOMAIN_INDICATORS.items())
+    for indicator in indicators
+}
+
+# Values for fields the LLM analysis leaves out
+_ANALYSIS_DEFAULTS: Mapping[str, Any] = MappingProxyType({
+    "domain": "general",
+    "sub_domains": (),
+    "personality": "helpful and professional",
+    "constraints": (),
+    "suggested_name": "MEXAR Agent",
+    "domain_keywords": (),
+    "tone": "professional",
+    "capabilities": ()
+})
+
+# Static instructions for prompt analysis. Kept in the system message and
+# identical across calls so providers can reuse the cached prefix; the user
+# message then carries only the prompt being analyzed.
+_ANALYSIS_SYSTEM = (
+    "You analyze AI agent system prompts and extract structured metadata. "
+    "Return ONLY valid JSON, no markdown or explanation, with keys: "
+    "domain (str, e.g. medical, legal, cooking, technology, finance, education), "
+    "sub_domains (list[str]), "
+    "personality (str, e.g. friendly, professional, empathetic), "
+    "constraints (list[str], behavioral constraints), "
+    "suggested_name (str, memorable and relevant to domain and personality), "
+    "domain_keywords (list[str], 20 keywords defining the domain; crucial for query filtering), "
+    "tone (str: formal/casual/empathetic/technical), "
+    "capabilities (list[str], what the agent can do)."
+)
+
+# The analyzed prompt is wrapped between these in the user message
+_ANALYSIS_USER_PREFIX = 'Analyze:\n"""\n'
+_ANALYSIS_USER_SUFFIX = '\n"""'
+
+# Knowledge context budget for enhanced system prompts. Tokens are estimated
+# at ~4 characters each, the same heuristic the semantic chunker uses.
+KNOWLEDGE_CONTEXT_TOKENS = 12_500
+CHARS_PER_TOKEN = 4
+
+_KNOWLEDGE_BASE_HEADER = """
+
+---
+KNOWLEDGE BASE CONTEXT:
+You have been provided with a comprehensive knowledge base containing domain-specific information.
+Use this knowledge to answer questions accurately and cite sources when possible.
+
+"""
+
+_BEHAVIORAL_GUIDELINES = """BEHAVIORAL GUIDELINES:
+1. Only answer questions related to your domain and knowledge base
+2. If a question is outside your domain, politely decline and explain your specialization
+3. Always be {tone} in your responses
+4. When uncertain, acknowledge limitations rather than guessing
+
+"""
+
+# Prompts at least this similar (cosine) reuse a stored analysis
+ANALYSIS_CACHE_THRESHOLD = 0.95
+
+# Max analyses in flight at once from analyze_prompts (Groq rate limits)
+ANALYZE_CONCURRENCY = 8
+
+_embedding_failed = False
+_embedding_lock = threading.Lock()
+
+
+def _embed_prompt(text: str):
+    """Embed a normalized prompt for the analysis cache (model loaded on first use)."""
+    global _embedding_failed
+    if _embedding_failed:
+        raise RuntimeError("Prompt embedding model unavailable")
+    try:
+        model = get_embedding_model()
+    except Exception as e:
+        with _embedding_lock:
+            if not _embedding_failed:
+                logger.warning("Prompt analysis cache disabled, embedding model failed to load: %s", e)
+                _embedding_failed = True
+        raise
+    return next(iter(model.embed([text])))
+
+
+def _freeze(result: Dict[str, Any]) -> Mapping[str, Any]:
+    """Read-only view of an analysis with its list fields turned into tuples."""
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in result.items()
+    })
+
+
+@lru_cache(maxsize=128)
+def _format_keywords(keywords: Tuple[str, ...]) -> str:
+    """Join domain keywords for display (memoized per keyword tuple)."""
+    return ", ".join(keywords)
+
+
+def _normalize_prompt(system_prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivially different prompts match."""
+    return " ".join(system_prompt.lower().split())
+
+
+# Analyses shared by every PromptAnalyzer (the worker creates one per job)
+_analysis_cache = SemanticCache(_embed_prompt, threshold=ANALYSIS_CACHE_THRESHOLD)
+
 
 class PromptAnalyzer:
     """
@@ -19,24 +210,33 @@ class PromptAnalyzer:
     Uses Groq LLM for intelligent prompt understanding.
     """
     
-    def __init__(self, groq_client: Optional[GroqClient] = None):
+    def __init__(
+        self,
+        groq_client: Optional[GroqClient] = None,
+        cache: Optional[SemanticCache] = None
+    ):
         """
         Initialize the prompt analyzer.
         
         Args:
             groq_client: Optional pre-configured Groq client
+            cache: Semantic cache for analyses (defaults to the shared one)
         """
         self.client = groq_client or get_groq_client()
+        self.cache = cache if cache is not None else _analysis_cache
     
-    def analyze_prompt(self, system_prompt: str) -> Dict[str, Any]:
+    def analyze_prompt(self, system_prompt: str) -> Mapping[str, Any]:
         """
         Analyze a system prompt to extract metadata.
         
+        The result is a read-only mapping (list fields are tuples) shared
+        with the analysis caches; use dict(result) for a mutable copy.
+        
         Args:
             system_prompt: The user's system prompt for the agent
             
         Returns:
-            Dict containing:
+            Mapping containing:
                 - domain: Primary domain (e.g., 'medical', 'legal', 'cooking')
                 - sub_domains: Related sub-domains
                 - personality: Agent personality traits
@@ -46,137 +246,126 @@ class PromptAnalyzer:
                 - tone: Communication tone
                 - capabilities: What the agent can do
         """
-        analysis_prompt = """You are a prompt analysis expert. Analyze the following system prompt and extract structured metadata.
-
-SYSTEM PROMPT TO ANALYZE:
-\"\"\"
-{prompt}
-\"\"\"
-
-Respond with a JSON object containing:
-{{
-    "domain": "primary domain (e.g., medical, legal, cooking, technology, finance, education)",
-    "sub_domains": ["list", "of", "related", "sub-domains"],
-    "personality": "brief personality description (e.g., friendly, professional, empathetic)",
-    "constraints": ["list", "of", "behavioral", "constraints"],
-    "suggested_name": "creative agent name based on domain and personality",
-    "domain_keywords": ["20", "keywords", "that", "define", "this", "domain"],
-    "tone": "communication tone (formal/casual/empathetic/technical)",
-    "capabilities": ["list", "of", "what", "agent", "can", "do"]
-}}
-
-Be thorough with domain_keywords - these are crucial for query filtering.
-Make the suggested_name memorable and relevant.
-"""
+        # Identical prompts are answered from the exact-match cache; cached
+        # analyses are frozen, so they are handed out without copying
+        prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        result = cached_domain_analysis(
+            prompt_hash, lambda: self._analyze_uncached(system_prompt)
+        )
+        if result is None:
+            return _freeze(self._create_fallback_analysis(system_prompt))
+        return result
+    
+    def _analyze_uncached(self, system_prompt: str) -> Optional[Mapping[str, Any]]:
+        """
+        Analyze a prompt via the semantic cache or the LLM.
+        
+        Returns None when the LLM call fails, so that failures are not cached
+        and the caller can fall back to keyword-based analysis.
+        """
+        # Near-duplicate prompts (templates, small edits) skip the LLM call
+        cache_key = _normalize_prompt(system_prompt)
+        cached = self.cache.lookup(cache_key)
+        if cached is not None:
+            logger.info("Prompt analysis cache hit: domain=%s", cached["domain"])
+            return cached
         
         try:
             response = self.client.analyze_with_system_prompt(
-                system_prompt="You are a JSON extraction assistant. Return only valid JSON, no markdown or explanation.",
-                user_message=analysis_prompt.format(prompt=system_prompt),
+                system_prompt=_ANALYSIS_SYSTEM,
+                user_message=_ANALYSIS_USER_PREFIX + system_prompt + _ANALYSIS_USER_SUFFIX,
                 model="chat",
                 json_mode=True
             )
             
-            result = json.loads(response)
+            result = orjson.loads(response)
             
             # Validate and ensure all fields exist
-            result = self._ensure_fields(result)
+            result = _freeze(self._ensure_fields(result))
+            self.cache.update(cache_key, result)
             
-            logger.info(f"Prompt analyzed: domain={result['domain']}, name={result['suggested_name']}")
+            logger.info(
+                "Prompt analyzed: domain=%s, name=%s", result["domain"], result["suggested_name"]
+            )
             return result
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM response as JSON: {e}")
-            return self._create_fallback_analysis(system_prompt)
-        except Exception as e:
-            logger.error(f"Error analyzing prompt: {e}")
-            return self._create_fallback_analysis(system_prompt)
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse LLM response as JSON: %s", e)
+            return None
+        except Exception:
+            logger.exception("Error analyzing prompt")
+            return None
+    
+    async def analyze_prompts(self, system_prompts: List[str]) -> List[Mapping[str, Any]]:
+        """
+        Analyze several system prompts concurrently.
+        
+        Duplicate prompts are analyzed once. Each analysis runs in a worker
+        thread, with at most ANALYZE_CONCURRENCY LLM calls in flight.
+        
+        Args:
+            system_prompts: Prompts to analyze
+            
+        Returns:
+            One analysis per input prompt, in input order
+        """
+        semaphore = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+        
+        async def analyze(system_prompt: str) -> Mapping[str, Any]:
+            async with semaphore:
+                return await asyncio.to_thread(self.analyze_prompt, system_prompt)
+        
+        unique_prompts = list(dict.fromkeys(system_prompts))
+        results = await asyncio.gather(*(analyze(p) for p in unique_prompts))
+        by_prompt = dict(zip(unique_prompts, results))
+        return [by_prompt[system_prompt] for system_prompt in system_prompts]
     
     def _ensure_fields(self, result: Dict) -> Dict:
         """Ensure all required fields exist in the result."""
-        defaults = {
-            "domain": "general",
-            "sub_domains": [],
-            "personality": "helpful and professional",
-            "constraints": [],
-            "suggested_name": "MEXAR Agent",
-            "domain_keywords": [],
-            "tone": "professional",
-            "capabilities": []
-        }
-        
-        for key, default in defaults.items():
-            if key not in result or result[key] is None:
-                result[key] = default
+        # Missing or None fields take the default; list defaults are empty
+        # tuples so merged results never share a mutable default
+        result = _ANALYSIS_DEFAULTS | {k: v for k, v in result.items() if v is not None}
         
         # Ensure domain_keywords has at least 10 items
-        if len(result.get("domain_keywords", [])) < 10:
+        if len(result["domain_keywords"]) < 10:
             result["domain_keywords"] = self._expand_keywords(
-                result.get("domain_keywords", []),
-                result.get("domain", "general")
+                result["domain_keywords"], result["domain"]
             )
         
         return result
     
     def _expand_keywords(self, existing: List[str], domain: str) -> List[str]:
         """Expand keywords list if too short."""
-        # Common domain-specific keywords
-        domain_defaults = {
-            "medical": ["health", "patient", "doctor", "treatment", "diagnosis", "symptoms", 
-                       "medicine", "hospital", "disease", "therapy", "prescription", "clinic",
-                       "medical", "healthcare", "wellness", "condition", "care", "physician",
-                       "nurse", "medication"],
-            "legal": ["law", "court", "legal", "attorney", "lawyer", "case", "contract",
-                     "rights", "litigation", "judge", "verdict", "lawsuit", "compliance",
-                     "regulation", "statute", "defendant", "plaintiff", "trial", "evidence",
-                     "testimony"],
-            "cooking": ["recipe", "cook", "ingredient", "food", "kitchen", "meal", "dish",
-                       "flavor", "cuisine", "bake", "chef", "cooking", "taste", "serve",
-                       "prepare", "dinner", "lunch", "breakfast", "snack", "dessert"],
-            "technology": ["software", "code", "programming", "computer", "system", "data",
-                          "network", "security", "cloud", "application", "development",
-                          "algorithm", "database", "API", "server", "hardware", "digital",
-                          "technology", "tech", "IT"],
-            "finance": ["money", "investment", "bank", "finance", "budget", "tax", "stock",
-                       "credit", "loan", "savings", "financial", "accounting", "capital",
-                       "asset", "portfolio", "market", "trading", "insurance", "wealth",
-                       "income"]
-        }
+        domain_lc = domain.lower()
         
         # Start with existing keywords
         keywords = list(existing)
+        seen_lc = {k.lower() for k in keywords}
         
         # Add domain defaults if available
-        if domain.lower() in domain_defaults:
-            for kw in domain_defaults[domain.lower()]:
-                if kw not in keywords and len(keywords) < 20:
-                    keywords.append(kw)
+        for kw in _DOMAIN_KEYWORDS.get(domain_lc, ()):
+            if len(keywords) >= 20:
+                break
+            kw_lc = kw.lower()
+            if kw_lc not in seen_lc:
+                keywords.append(kw)
+                seen_lc.add(kw_lc)
         
         # Add the domain itself if not present
-        if domain.lower() not in [k.lower() for k in keywords]:
+        if domain_lc not in seen_lc:
             keywords.append(domain)
         
         return keywords[:20]
     
     def _create_fallback_analysis(self, system_prompt: str) -> Dict[str, Any]:
         """Create a fallback analysis when LLM fails."""
-        # Simple keyword extraction
-        words = system_prompt.lower().split()
-        
-        # Try to detect domain from common words
-        domain_indicators = {
-            "medical": ["medical", "doctor", "patient", "health", "hospital", "treatment"],
-            "legal": ["legal", "law", "attorney", "court", "contract", "rights"],
-            "cooking": ["cook", "recipe", "food", "chef", "kitchen", "ingredient"],
-            "technology": ["tech", "software", "code", "programming", "computer"],
-            "finance": ["finance", "money", "bank", "investment", "budget"]
-        }
-        
-        detected_domain = "general"
-        for domain, indicators in domain_indicators.items():
-            if any(ind in words for ind in indicators):
-                detected_domain = domain
-                break
+        # Try to detect domain from common words in a single scan
+        best_hit = min(
+            (_INDICATOR_INDEX[word] for word in system_prompt.lower().split()
+             if word in _INDICATOR_INDEX),
+            default=None
+        )
+        detected_domain = best_hit[1] if best_hit else "general"
         
         return {
             "domain": detected_domain,
@@ -206,77 +395,28 @@ Make the suggested_name memorable and relevant.
         Returns:
             Enhanced system prompt for the agent
         """
-        enhanced_prompt = f"""{original_prompt}
-
----
-KNOWLEDGE BASE CONTEXT:
-You have been provided with a comprehensive knowledge base containing domain-specific information.
-Use this knowledge to answer questions accurately and cite sources when possible.
-
-DOMAIN: {analysis['domain']}
-DOMAIN KEYWORDS: {', '.join(analysis['domain_keywords'][:10])}
-
-BEHAVIORAL GUIDELINES:
-1. Only answer questions related to your domain and knowledge base
-2. If a question is outside your domain, politely decline and explain your specialization
-3. Always be {analysis['tone']} in your responses
-4. When uncertain, acknowledge limitations rather than guessing
-
-KNOWLEDGE CONTEXT:
-{cag_context[:50000]}  # Limit to prevent token overflow
-"""
-        
-        return enhanced_prompt
+        # Assembled with a single join; the knowledge context is cut to its
+        # token budget before it is copied into the prompt
+        return "".join((
+            original_prompt,
+            _KNOWLEDGE_BASE_HEADER,
+            f"DOMAIN: {analysis['domain']}\n",
+            f"DOMAIN KEYWORDS: {_format_keywords(tuple(analysis['domain_keywords'][:10]))}\n\n",
+            _BEHAVIORAL_GUIDELINES.format(tone=analysis["tone"]),
+            "KNOWLEDGE CONTEXT:\n",
+            cag_context[:KNOWLEDGE_CONTEXT_TOKENS * CHARS_PER_TOKEN],
+            "\n"
+        ))
     
-    def get_system_prompt_templates(self) -> List[Dict[str, str]]:
+    @staticmethod
+    def get_system_prompt_templates() -> Tuple[Mapping[str, str], ...]:
         """
-        Return a list of system prompt templates for common domains.
+        Return the system prompt templates for common domains.
         
         Returns:
-            List of template dictionaries with name and content
+            Read-only template mappings with name, domain and content
         """
-        return [
-            {
-                "name": "Medical Assistant",
-                "domain": "medical",
-                "template": """You are a knowledgeable medical information assistant. 
-Your role is to provide accurate health information based on your knowledge base.
-You should be empathetic, professional, and always recommend consulting healthcare professionals for personal medical advice.
-Never provide diagnoses - only educational information."""
-            },
-            {
-                "name": "Legal Advisor",
-                "domain": "legal",
-                "template": """You are a legal information assistant providing general legal knowledge.
-Be professional and precise in your explanations.
-Always clarify that you provide educational information, not legal advice.
-Recommend consulting a licensed attorney for specific legal matters."""
-            },
-            {
-                "name": "Recipe Chef",
-                "domain": "cooking",
-                "template": """You are a friendly culinary assistant with expertise in cooking and recipes.
-Help users with cooking techniques, ingredient substitutions, and recipe adaptations.
-Be enthusiastic about food and encourage culinary exploration.
-Provide clear, step-by-step instructions when explaining recipes."""
-            },
-            {
-                "name": "Tech Support",
-                "domain": "technology",
-                "template": """You are a technical support specialist helping users with technology questions.
-Explain complex concepts in simple terms.
-Provide step-by-step troubleshooting guidance.
-Be patient and thorough in your explanations."""
-            },
-            {
-                "name": "Financial Guide",
-                "domain": "finance",
-                "template": """You are a financial information assistant providing educational content about personal finance.
-Be clear and professional when explaining financial concepts.
-Always remind users that this is educational information, not financial advice.
-Recommend consulting certified financial professionals for personal financial decisions."""
-            }
-        ]
+        return _TEMPLATES
 
 
 # Factory function
@@ -285,52 +425,23 @@ def create_prompt_analyzer() -> PromptAnalyzer:
     return PromptAnalyzer()
 
 
-def get_prompt_templates() -> List[Dict[str, str]]:
+# Shared instance for request handlers; the analyzer holds no per-call state
+_analyzer_instance: Optional[PromptAnalyzer] = None
+
+
+def get_prompt_analyzer() -> PromptAnalyzer:
+    """Get or create the singleton PromptAnalyzer instance."""
+    global _analyzer_instance
+    if _analyzer_instance is None:
+        _analyzer_instance = PromptAnalyzer()
+    return _analyzer_instance
+
+
+def get_prompt_templates() -> Tuple[Mapping[str, str], ...]:
     """
     Get system prompt templates without initializing Groq client.
     
     Returns:
-        List of template dictionaries with name and content
+        Read-only template mappings with name, domain and content
     """
-    return [
-        {
-            "name": "Medical Assistant",
-            "domain": "medical",
-            "template": """You are a knowledgeable medical information assistant. 
-Your role is to provide accurate health information based on your knowledge base.
-You should be empathetic, professional, and always recommend consulting healthcare professionals for personal medical advice.
-Never provide diagnoses - only educational information."""
-        },
-        {
-            "name": "Legal Advisor",
-            "domain": "legal",
-            "template": """You are a legal information assistant providing general legal knowledge.
-Be professional and precise in your explanations.
-Always clarify that you provide educational information, not legal advice.
-Recommend consulting a licensed attorney for specific legal matters."""
-        },
-        {
-            "name": "Recipe Chef",
-            "domain": "cooking",
-            "template": """You are a friendly culinary assistant with expertise in cooking and recipes.
-Help users with cooking techniques, ingredient substitutions, and recipe adaptations.
-Be enthusiastic about food and encourage culinary exploration.
-Provide clear, step-by-step instructions when explaining recipes."""
-        },
-        {
-            "name": "Tech Support",
-            "domain": "technology",
-            "template": """You are a technical support specialist helping users with technology questions.
-Explain complex concepts in simple terms.
-Provide step-by-step troubleshooting guidance.
-Be patient and thorough in your explanations."""
-        },
-        {
-            "name": "Financial Guide",
-            "domain": "finance",
-            "template": """You are a financial information assistant providing educational content about personal finance.
-Be clear and professional when explaining financial concepts.
-Always remind users that this is educational information, not financial advice.
-Recommend consulting certified financial professionals for personal financial decisions."""
-        }
-    ]
+    return _TEMPLATES
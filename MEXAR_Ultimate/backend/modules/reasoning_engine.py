@@ -4,21 +4,26 @@ Pure RAG with Source Attribution + Faithfulness scoring.
 No CAG preloading - dynamic retrieval per query.
 """
 
-import json
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
 from pathlib import Path
-import networkx as nx
-from difflib import SequenceMatcher
 import numpy as np
+from rapidfuzz import fuzz, process
 
 from utils.groq_client import get_groq_client, GroqClient
 from utils.hybrid_search import HybridSearcher
 from utils.reranker import Reranker
 from utils.source_attribution import SourceAttributor
 from utils.faithfulness import FaithfulnessScorer
-from fastembed import TextEmbedding
-from core.database import SessionLocal
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_model import EMBEDDING_DIM, embed_matrix, get_embedding_model
+from core.cache import cache_answer, get_cached_answer, get_cached_agent_data
+from modules.prompt_analyzer import CHARS_PER_TOKEN
+from sqlalchemy.orm import Session
 from models.agent import Agent
 from models.chunk import DocumentChunk
 
@@ -26,6 +31,60 @@ from models.chunk import DocumentChunk
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Runs pipeline stages that don't depend on each other (chunk embedding,
+# the faithfulness LLM call) alongside the request thread
+_stage_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="reasoning-stage")
+
+# Token budget for retrieved context in the answer prompt
+ANSWER_CONTEXT_TOKENS = 20_000
+_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Fixed parts of the answer prompt; only the context and multimodal input
+# change per query (the agent's own prefix is built once, in _fetch_agent)
+_CONTEXT_HEADER = "\n\nRETRIEVED KNOWLEDGE BASE CONTEXT:\n"
+
+_MULTIMODAL_HEADER = "\n\nMULTIMODAL INPUT (User uploaded media):\n"
+_MULTIMODAL_NOTE = """
+
+IMPORTANT: When the user asks about images, audio, or other uploaded media, 
+use the descriptions above to answer their questions. The multimodal input 
+contains AI-generated descriptions of what the user has uploaded."""
+
+_ANSWER_INSTRUCTIONS = """
+
+IMPORTANT INSTRUCTIONS:
+1. Answer using the retrieved context AND any multimodal input provided
+2. If the user asks about uploaded images/audio, use the MULTIMODAL INPUT section
+3. If asking about knowledge base topics, use the RETRIEVED CONTEXT
+4. If information is not available in any source, say "I don't have information about that"
+5. Be specific and cite sources when possible
+6. Be concise but comprehensive
+7. If you quote directly, use quotation marks
+"""
+
+
+@dataclass(frozen=True)
+class GuardrailProfile:
+    """An agent's domain terms, lowercased once when the agent is loaded."""
+    __slots__ = ("domain_lc", "sub_domains_lc", "keywords_lc", "signature_set", "signature_lc")
+    
+    domain_lc: str
+    sub_domains_lc: Tuple[str, ...]
+    keywords_lc: Tuple[str, ...]
+    signature_set: FrozenSet[str]
+    signature_lc: Tuple[str, ...]  # First 100 keywords, in order, for fuzzy matching
+    
+    @classmethod
+    def build(cls, domain_signature: List[str], prompt_analysis: Dict[str, Any]) -> "GuardrailProfile":
+        """Build a profile from an agent's signature and prompt analysis."""
+        return cls(
+            domain_lc=prompt_analysis.get("domain", "").lower(),
+            sub_domains_lc=tuple(s.lower() for s in prompt_analysis.get("sub_domains", [])),
+            keywords_lc=tuple(k.lower() for k in prompt_analysis.get("domain_keywords", [])),
+            signature_set=frozenset(kw.lower() for kw in domain_signature),
+            signature_lc=tuple(kw.lower() for kw in domain_signature[:100])
+        )
+
 
 class ReasoningEngine:
     """
@@ -39,6 +98,12 @@ class ReasoningEngine:
     # Domain guardrail threshold (lowered for better general question handling)
     DOMAIN_SIMILARITY_THRESHOLD = 0.05
     
+    # Fuzzy ratio (0-100) above which a query word matches a signature keyword
+    FUZZY_MATCH_THRESHOLD = 75
+    
+    # Answers below this confidence are not cached, so a bad answer isn't pinned
+    ANSWER_CACHE_MIN_CONFIDENCE = 0.5
+    
     def __init__(
         self,
         groq_client: Optional[GroqClient] = None,
@@ -54,27 +119,26 @@ class ReasoningEngine:
         self.client = groq_client or get_groq_client()
         self.data_dir = Path(data_dir)
         
-        # Initialize embedding model (384 dim - matches compiler)
+        # Shared embedding model (384 dim - matches compiler)
         try:
-            self.embedding_model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
-            logger.info("FastEmbed bge-small-en-v1.5 loaded (384 dim)")
+            self.embedding_model = get_embedding_model()
         except Exception as e:
             logger.error(f"Failed to load embedding model: {e}")
             self.embedding_model = None
         
         # Initialize RAG components
         self.searcher = HybridSearcher(self.embedding_model) if self.embedding_model else None
-        self.reranker = Reranker()
+        # Rerank scores feed confidence and explainability, so score even
+        # candidate lists the cross-encoder wouldn't reorder away
+        self.reranker = Reranker(always_rerank=True)
         self.attributor = SourceAttributor(self.embedding_model)
         self.faithfulness_scorer = FaithfulnessScorer()
-        
-        # Cache for loaded agents
-        self._agent_cache: Dict[str, Dict] = {}
     
     def reason(
         self,
         agent_name: str,
         query: str,
+        db: Session,
         multimodal_context: str = ""
     ) -> Dict[str, Any]:
         """
@@ -83,6 +147,7 @@ class ReasoningEngine:
         Args:
             agent_name: Name of the agent to use
             query: User's question
+            db: Request-scoped database session
             multimodal_context: Additional context from audio/image/video
             
         Returns:
@@ -92,20 +157,32 @@ class ReasoningEngine:
                 - in_domain: Whether query is in domain
                 - explainability: Full explainability data
         """
-        # Load agent from Supabase
-        agent = self._load_agent(agent_name)
-        
         # Combine query with multimodal context
         full_query = query
         if multimodal_context:
             full_query = f"{query}\n\n[ADDITIONAL CONTEXT]\n{multimodal_context}"
         
-        # Step 1: Check domain guardrail
-        in_domain, domain_score = self._check_guardrail(
-            full_query,
-            agent["domain_signature"],
-            agent["prompt_analysis"]
+        # Load agent from Supabase
+        agent = self._load_agent(db, agent_name)
+        
+        # Repeated questions skip the whole pipeline
+        answer_key = (
+            f"{hashlib.sha256(query.encode()).hexdigest()}:"
+            f"{hashlib.sha256(multimodal_context.encode()).hexdigest()}"
         )
+        cached = get_cached_answer(agent["id"], answer_key)
+        if cached is not None:
+            logger.info(f"Answer cache hit for agent {agent_name}")
+            return cached
+        
+        # Both retrieval branches run inside one SQL round-trip; what can
+        # overlap is the query embedding, so start it while the guardrail runs
+        embedding_future = None
+        if self.searcher:
+            embedding_future = _stage_executor.submit(self.searcher.embed_query, full_query)
+        
+        # Step 1: Check domain guardrail
+        in_domain, domain_score = self._check_guardrail(full_query, agent)
         
         if not in_domain:
             return self._create_out_of_domain_response(
@@ -117,41 +194,60 @@ class ReasoningEngine:
         # Step 2: Hybrid Search (semantic + keyword)
         search_results = []
         if self.searcher:
-            search_results = self.searcher.search(full_query, agent["id"], top_k=20)
+            query_embedding = None
+            try:
+                query_embedding = embedding_future.result()
+            except Exception as e:
+                logger.warning(f"Query embedding failed, search will retry: {e}")
+            search_results = self.searcher.search(
+                full_query, agent["id"], db, top_k=20, query_embedding=query_embedding
+            )
         
         if not search_results:
             # Fallback to simple query
             return self._create_no_results_response(query, agent)
         
         # Step 3: Rerank with cross-encoder
-        chunks = [r[0] for r in search_results]
-        rrf_scores = [r[1] for r in search_results]
+        chunks = list(map(itemgetter(0), search_results))
+        rrf_scores = list(map(itemgetter(1), search_results))
         
         reranked = self.reranker.rerank(full_query, chunks, top_k=5)
-        top_chunks = [r[0] for r in reranked]
-        rerank_scores = [r[1] for r in reranked]
+        top_chunks = list(map(itemgetter(0), reranked))
+        rerank_scores = list(map(itemgetter(1), reranked))
+        
+        # Chunk embeddings (for attribution) only depend on the chunks, so
+        # compute them while the answer is being generated
+        embed_future = None
+        if self.embedding_model:
+            embed_future = _stage_executor.submit(self._embed_chunks, top_chunks)
         
         # Step 4: Generate answer with focused context
-        context = "\n\n---\n\n".join([c.content for c in top_chunks])
+        context = self._pack_context(top_chunks)
         answer = self._generate_answer(
             query=query,  # Use original query, not full_query
             context=context,
-            system_prompt=agent["system_prompt"],
+            system_prefix=agent["answer_prompt_prefix"],
             multimodal_context=multimodal_context  # Pass multimodal context separately
         )
         
+        # Steps 5 and 6 only need the answer: score faithfulness (an LLM
+        # round-trip) in the background while attributing sources here
+        faithfulness_future = _stage_executor.submit(
+            self.faithfulness_scorer.score, answer, context
+        )
+        
         # Step 5: Source Attribution
         chunk_embeddings = None
-        if self.embedding_model:
+        if embed_future is not None:
             try:
-                chunk_embeddings = list(self.embedding_model.embed([c.content for c in top_chunks]))
-            except:
-                pass
+                chunk_embeddings = embed_future.result()
+            except Exception as e:
+                logger.warning(f"Chunk embedding for attribution failed: {e}")
         
         attribution = self.attributor.attribute(answer, top_chunks, chunk_embeddings)
         
         # Step 6: Faithfulness Scoring
-        faithfulness_result = self.faithfulness_scorer.score(answer, context)
+        faithfulness_result = faithfulness_future.result()
         
         # Step 7: Calculate Confidence
         top_similarity = rrf_scores[0] if rrf_scores else 0
@@ -178,7 +274,7 @@ class ReasoningEngine:
         
         logger.info(f"Reasoning complete: confidence={confidence:.2f}, chunks={len(top_chunks)}, faithfulness={faithfulness_result.score:.2f}")
         
-        return {
+        result = {
             "answer": attribution.answer_with_citations,
             "confidence": confidence,
             "in_domain": True,
@@ -186,42 +282,81 @@ class ReasoningEngine:
             "entities_found": [],  # Legacy, kept for compatibility
             "explainability": explainability
         }
+        
+        if confidence >= self.ANSWER_CACHE_MIN_CONFIDENCE:
+            cache_answer(agent["id"], answer_key, result)
+        
+        return result
     
-    def _load_agent(self, agent_name: str) -> Dict[str, Any]:
-        """Load agent from Supabase (with caching)."""
-        if agent_name in self._agent_cache:
-            return self._agent_cache[agent_name]
+    def _embed_chunks(self, chunks: List[DocumentChunk]) -> np.ndarray:
+        """
+        Get chunk embeddings for source attribution.
         
-        db = SessionLocal()
-        try:
-            agent = db.query(Agent).filter(Agent.name == agent_name).first()
-            
-            if not agent:
-                raise ValueError(f"Agent '{agent_name}' not found")
-            
-            agent_data = {
-                "id": agent.id,
-                "name": agent.name,
-                "system_prompt": agent.system_prompt,
-                "domain": agent.domain,
-                "domain_signature": agent.domain_signature or [],
-                "prompt_analysis": agent.prompt_analysis or {},
-                "knowledge_graph": agent.knowledge_graph_json or {},
-                "chunk_count": agent.chunk_count or 0
-            }
-            
-            self._agent_cache[agent_name] = agent_data
-            return agent_data
-        finally:
-            db.close()
+        Retrieval loads each chunk's stored embedding with the row (a
+        HalfVector for halfvec columns, an ndarray for vector ones), so
+        normally nothing is embedded here. Chunks without one are embedded
+        through the process-wide cache, keyed by id (recompiling an agent
+        inserts new rows, so ids never point at changed content).
+        
+        Returns:
+            One float32 row per chunk, in a single contiguous array
+        """
+        embeddings = np.empty((len(chunks), EMBEDDING_DIM), dtype=np.float32)
+        missing = []
+        for i, chunk in enumerate(chunks):
+            stored = chunk.embedding
+            if stored is None:
+                missing.append(i)
+            elif hasattr(stored, "to_numpy"):
+                embeddings[i] = stored.to_numpy()
+            else:
+                embeddings[i] = np.asarray(stored, dtype=np.float32)
+        
+        if missing:
+            fresh = get_embedding_cache().embed(
+                self.embedding_model.model_name,
+                [chunks[i].content for i in missing],
+                lambda contents: embed_matrix(self.embedding_model, contents),
+                keys=[("chunk", chunks[i].id) for i in missing]
+            )
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+        
+        return embeddings
     
-    def _check_guardrail(
-        self,
-        query: str,
-        domain_signature: List[str],
-        prompt_analysis: Dict[str, Any]
-    ) -> Tuple[bool, float]:
-        """Check if query matches the domain."""
+    def _load_agent(self, db: Session, agent_name: str) -> Dict[str, Any]:
+        """Load agent from Supabase (cached process-wide for a few minutes)."""
+        return get_cached_agent_data(agent_name, lambda: self._fetch_agent(db, agent_name))
+    
+    def _fetch_agent(self, db: Session, agent_name: str) -> Dict[str, Any]:
+        """Query an agent and precompute the data reasoning needs from it."""
+        agent = db.query(Agent).filter(Agent.name == agent_name).first()
+        
+        if not agent:
+            raise ValueError(f"Agent '{agent_name}' not found")
+        
+        domain_signature = agent.domain_signature or []
+        prompt_analysis = agent.prompt_analysis or {}
+        
+        agent_data = {
+            "id": agent.id,
+            "name": agent.name,
+            "system_prompt": agent.system_prompt,
+            "domain": agent.domain,
+            "domain_signature": domain_signature,
+            "prompt_analysis": prompt_analysis,
+            "knowledge_graph": agent.knowledge_graph_json or {},
+            "chunk_count": agent.chunk_count or 0,
+            "answer_prompt_prefix": f"{agent.system_prompt}{_CONTEXT_HEADER}",
+            # Built once here so the guardrail doesn't redo it per query
+            "guardrail": GuardrailProfile.build(domain_signature, prompt_analysis)
+        }
+        
+        return agent_data
+    
+    def _check_guardrail(self, query: str, agent: Dict[str, Any]) -> Tuple[bool, float]:
+        """Check if query matches the domain of a loaded agent."""
+        profile: GuardrailProfile = agent["guardrail"]
         query_lower = query.lower()
         query_words = set(query_lower.split())
         
@@ -229,33 +364,46 @@ class ReasoningEngine:
         bonus_matches = 0
         
         # Check domain match
-        domain = prompt_analysis.get("domain", "")
-        if domain.lower() in query_lower:
+        if profile.domain_lc in query_lower:
             bonus_matches += 3
         
         # Check sub-domains
-        for sub_domain in prompt_analysis.get("sub_domains", []):
-            if sub_domain.lower() in query_lower:
+        for sub_domain in profile.sub_domains_lc:
+            if sub_domain in query_lower:
                 bonus_matches += 2
         
         # Check domain keywords
-        for keyword in prompt_analysis.get("domain_keywords", []):
-            if keyword.lower() in query_lower:
+        for keyword in profile.keywords_lc:
+            if keyword in query_lower:
                 bonus_matches += 1.5
         
-        # Check signature keywords with fuzzy matching
-        signature_lower = [kw.lower() for kw in (domain_signature or [])]
-        
-        for word in query_words:
-            if len(word) < 3:
-                continue
-            for kw in signature_lower[:100]:
-                if self._fuzzy_match(word, kw) > 0.75:
-                    matches += 1
-                    break
-                if word in kw or kw in word:
+        # Exact signature keywords are a hash lookup; only the rest go fuzzy
+        exact_hits = {word for word in query_words if len(word) >= 3} & profile.signature_set
+        matches += len(exact_hits)
+        
+        # Check remaining words against signature keywords with fuzzy matching
+        signature_lower = profile.signature_lc
+        candidate_words = [
+            word for word in query_words if len(word) >= 3 and word not in exact_hits
+        ]
+        
+        if signature_lower and candidate_words:
+            # One C-level pass scores every (word, keyword) pair
+            fuzzy_hits = process.cdist(
+                candidate_words, signature_lower,
+                scorer=fuzz.ratio, score_cutoff=self.FUZZY_MATCH_THRESHOLD
+            ) > self.FUZZY_MATCH_THRESHOLD
+            first_fuzzy = np.where(
+                fuzzy_hits.any(axis=1), fuzzy_hits.argmax(axis=1), len(signature_lower)
+            )
+            
+            # Keywords are checked in order: a substring hit on an earlier
+            # keyword takes precedence over a later fuzzy hit
+            for word, fuzzy_at in zip(candidate_words, first_fuzzy.tolist()):
+                if any(word in kw or kw in word for kw in signature_lower[:fuzzy_at]):
                     matches += 0.5
-                    break
+                elif fuzzy_at < len(signature_lower):
+                    matches += 1
         
         # Calculate score
         max_possible = max(1, min(len(query_words), 10))
@@ -272,52 +420,67 @@ class ReasoningEngine:
         
         return is_in_domain, score
     
-    def _fuzzy_match(self, s1: str, s2: str) -> float:
-        """Calculate fuzzy match ratio."""
-        return SequenceMatcher(None, s1, s2).ratio()
+    def _pack_context(self, chunks: List[DocumentChunk]) -> str:
+        """
+        Join chunk contents, in rank order, up to the answer context budget.
+        
+        Whole chunks are packed until the next one would overflow the token
+        budget, so no chunk is cut mid-sentence; only a single top chunk
+        larger than the whole budget is truncated.
+        """
+        budget = ANSWER_CONTEXT_TOKENS * CHARS_PER_TOKEN
+        packed: List[str] = []
+        used = 0
+        for chunk in chunks:
+            cost = len(chunk.content) + (len(_CONTEXT_SEPARATOR) if packed else 0)
+            if used + cost > budget:
+                if not packed:
+                    packed.append(chunk.content[:budget])
+                break
+            packed.append(chunk.content)
+            used += cost
+        return _CONTEXT_SEPARATOR.join(packed)
     
     def _generate_answer(
         self,
         query: str,
         context: str,
-        system_prompt: str,
+        system_prefix: str,
         multimodal_context: str = ""
     ) -> str:
-        """Generate answer using LLM with retrieved context and multimodal data."""
+        """
+        Generate answer using LLM with retrieved context and multimodal data.
         
-        # Build multimodal section if present
-        multimodal_section = ""
+        `system_prefix` is the agent's system prompt with the context header
+        already appended, so only the per-query parts are joined here.
+        """
         if multimodal_context:
-            multimodal_section = f"""\n\nMULTIMODAL INPUT (User uploaded media):
-{multimodal_context}
-
-IMPORTANT: When the user asks about images, audio, or other uploaded media, 
-use the descriptions above to answer their questions. The multimodal input 
-contains AI-generated descriptions of what the user has uploaded."""
-        
-        full_system_prompt = f"""{system_prompt}
-
-RETRIEVED KNOWLEDGE BASE CONTEXT:
-{context[:80000]}
-{multimodal_section}
-
-IMPORTANT INSTRUCTIONS:
-1. Answer using the retrieved context AND any multimodal input provided
-2. If the user asks about uploaded images/audio, use the MULTIMODAL INPUT section
-3. If asking about knowledge base topics, use the RETRIEVED CONTEXT
-4. If information is not available in any source, say "I don't have information about that"
-5. Be specific and cite sources when possible
-6. Be concise but comprehensive
-7. If you quote directly, use quotation marks
-"""
+            full_system_prompt = "".join((
+                system_prefix, context, "\n", _MULTIMODAL_HEADER,
+                multimodal_context, _MULTIMODAL_NOTE, _ANSWER_INSTRUCTIONS
+            ))
+        else:
+            full_system_prompt = "".join((system_prefix, context, "\n", _ANSWER_INSTRUCTIONS))
+        
+        messages = [
+            {"role": "system", "content": full_system_prompt},
+            {"role": "user", "content": query}
+        ]
         
         try:
-            answer = self.client.analyze_with_system_prompt(
-                system_prompt=full_system_prompt,
-                user_message=query,
-                model="chat"
-            )
-            return answer
+            # Stream the answer and embed each sentence as soon as it is
+            # complete, so attribution finds them already embedded
+            answer_parts = []
+            pending = ""
+            for delta in self.client.stream_chat_completion(messages, model="chat"):
+                answer_parts.append(delta)
+                if not self.embedding_model:
+                    continue
+                pending += delta
+                sentences, pending = self.attributor.split_complete_sentences(pending)
+                if sentences:
+                    _stage_executor.submit(self.attributor.embed_sentences, sentences)
+            return "".join(answer_parts)
         except Exception as e:
             logger.error(f"Answer generation failed: {e}")
             return "I apologize, but I encountered an error processing your query. Please try again."
@@ -85,6 +85,7 @@ class InferenceService:
             result = engine.reason(
                 agent_name=agent.name,
                 query=message,
+                db=db,
                 multimodal_context=multimodal_context
             )
             
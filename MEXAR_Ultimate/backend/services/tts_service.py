@@ -6,14 +6,23 @@ Provides text-to-speech capabilities with multiple provider support.
 import os
 import logging
 import hashlib
-import requests
+import threading
+import httpx
+import orjson
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 
+from core.cache import SingleFlight
+from core.resilience import send_with_retry
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Upper bound on cached audio; eviction trims back to the low watermark
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "500")) * 1024 * 1024
+TTS_CACHE_LOW_WATERMARK = 0.9
+
 
 class TTSService:
     """
@@ -22,20 +31,33 @@ class TTSService:
     - Web Speech API (browser-based, unlimited, handled client-side)
     """
     
-    def __init__(self, cache_dir: str = "data/tts_cache"):
+    def __init__(self, cache_dir: str = "data/tts_cache", max_cache_bytes: int = TTS_CACHE_MAX_BYTES):
         """
         Initialize TTS service.
         
         Args:
             cache_dir: Directory to cache generated audio files
+            max_cache_bytes: Total size above which least recently used audio is evicted
         """
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
+        # Files are sharded into 256 subdirectories by key prefix
+        self._known_shards = set()
+        self.max_cache_bytes = max_cache_bytes
+        self._cache_bytes: Optional[int] = None  # Computed lazily on first write
+        self._cache_lock = threading.Lock()
+        
         # ElevenLabs configuration
         self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
         self.elevenlabs_base_url = "https://api.elevenlabs.io/v1"
         
+        # Shared HTTP client (keeps connections to ElevenLabs alive between calls)
+        self._http = httpx.Client(timeout=30)
+        
+        # Concurrent cache misses for the same audio share one API call
+        self._inflight = SingleFlight()
+        
         # Default voices
         self.default_voices = {
             "elevenlabs": "21m00Tcm4TlvDq8ikWAM",  # Rachel - neutral
@@ -69,10 +91,11 @@ class TTSService:
         
         # Check cache first
         cache_key = self._get_cache_key(text, provider, voice_id)
-        cached_file = self.cache_dir / f"{cache_key}.mp3"
+        cached_file = self.find_cached(cache_key)
         
-        if cached_file.exists():
+        if cached_file is not None:
             logger.info(f"Using cached TTS audio: {cache_key}")
+            self._touch(cached_file)
             return {
                 "success": True,
                 "provider": provider,
@@ -84,7 +107,10 @@ class TTSService:
         
         # Generate new audio
         if provider == "elevenlabs":
-            return self._generate_elevenlabs(text, voice_id, model_id, cached_file)
+            return self._inflight.do(
+                cache_key,
+                lambda: self._generate_elevenlabs(text, voice_id, model_id, cached_file)
+            )
         elif provider == "web_speech":
             # Web Speech API is client-side only
             return {
@@ -136,12 +162,18 @@ class TTSService:
                 }
             }
             
-            response = requests.post(url, json=data, headers=headers, timeout=30)
+            body = orjson.dumps(data)
+            response = send_with_retry(
+                "elevenlabs",
+                lambda: self._http.post(url, content=body, headers=headers)
+            )
             
             if response.status_code == 200:
                 # Save audio file
+                self._ensure_shard(output_path.parent)
                 with open(output_path, "wb") as f:
                     f.write(response.content)
+                self._account_and_evict(len(response.content))
                 
                 logger.info(f"Generated ElevenLabs TTS: {len(text)} chars")
                 
@@ -202,10 +234,13 @@ class TTSService:
                 url = f"{self.elevenlabs_base_url}/voices"
                 headers = {"xi-api-key": self.elevenlabs_api_key}
                 
-                response = requests.get(url, headers=headers, timeout=10)
+                response = send_with_retry(
+                    "elevenlabs",
+                    lambda: self._http.get(url, headers=headers, timeout=10)
+                )
                 
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     return [
                         {
                             "id": voice["voice_id"],
@@ -245,10 +280,13 @@ class TTSService:
             url = f"{self.elevenlabs_base_url}/user"
             headers = {"xi-api-key": self.elevenlabs_api_key}
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = send_with_retry(
+                "elevenlabs",
+                lambda: self._http.get(url, headers=headers, timeout=10)
+            )
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 subscription = data.get("subscription", {})
                 
                 return {
@@ -274,6 +312,86 @@ class TTSService:
         content = f"{provider}:{voice_id or 'default'}:{text}"
         return hashlib.md5(content.encode()).hexdigest()
     
+    def cache_path(self, cache_key: str) -> Path:
+        """Sharded location of a cached audio file (cache_dir/ab/abcd....mp3)."""
+        return self.cache_dir / cache_key[:2] / f"{cache_key}.mp3"
+    
+    def find_cached(self, cache_key: str) -> Optional[Path]:
+        """
+        Locate a cached audio file, moving a legacy flat one (cache_dir/<key>.mp3,
+        from before sharding) into its shard on first request.
+        """
+        path = self.cache_path(cache_key)
+        if path.exists():
+            return path
+        
+        legacy = self.cache_dir / f"{cache_key}.mp3"
+        if not legacy.exists():
+            return None
+        try:
+            self._ensure_shard(path.parent)
+            os.replace(legacy, path)
+        except OSError as e:
+            logger.warning(f"Failed to migrate legacy cache file {legacy}: {e}")
+            return legacy if legacy.exists() else None
+        return path
+    
+    def _cache_files(self):
+        """All cached audio files, sharded and legacy flat ones."""
+        yield from self.cache_dir.glob("??/*.mp3")
+        yield from self.cache_dir.glob("*.mp3")
+    
+    def _ensure_shard(self, shard_dir: Path):
+        """Create a shard directory once; later calls skip the filesystem."""
+        if shard_dir not in self._known_shards:
+            shard_dir.mkdir(parents=True, exist_ok=True)
+            self._known_shards.add(shard_dir)
+    
+    def _touch(self, file: Path):
+        """Refresh mtime on a cache hit so eviction is least-recently-used."""
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+    
+    def _account_and_evict(self, added_bytes: int):
+        """Track cache size and evict oldest files once over the budget."""
+        with self._cache_lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(
+                    f.stat().st_size for f in self._cache_files()
+                )
+            else:
+                self._cache_bytes += added_bytes
+            
+            if self._cache_bytes <= self.max_cache_bytes:
+                return
+            
+            target = int(self.max_cache_bytes * TTS_CACHE_LOW_WATERMARK)
+            entries = []
+            for file in self._cache_files():
+                try:
+                    st = file.stat()
+                    entries.append((st.st_mtime, st.st_size, file))
+                except OSError:
+                    continue
+            entries.sort()
+            
+            total = sum(size for _, size, _ in entries)
+            evicted = 0
+            for _, size, file in entries:
+                if total <= target:
+                    break
+                try:
+                    file.unlink()
+                    total -= size
+                    evicted += 1
+                except OSError as e:
+                    logger.warning(f"Failed to evict cache file {file}: {e}")
+            
+            self._cache_bytes = total
+            logger.info(f"Evicted {evicted} TTS cache files, cache now {total} bytes")
+    
     def clear_cache(self) -> int:
         """
         Clear all cached audio files.
@@ -282,13 +400,16 @@ class TTSService:
             Number of files deleted
         """
         count = 0
-        for file in self.cache_dir.glob("*.mp3"):
+        for file in self._cache_files():
             try:
                 file.unlink()
                 count += 1
             except Exception as e:
                 logger.warning(f"Failed to delete cache file {file}: {e}")
         
+        with self._cache_lock:
+            self._cache_bytes = None
+        
         logger.info(f"Cleared {count} cached TTS files")
         return count
 
@@ -0,0 +1,105 @@
+"""
+MEXAR - Embedding Cache Module
+Process-wide LRU of text embeddings, so repeated queries and stable chunks
+are not re-embedded on every request.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Embeddings kept in memory (384-dim float16 is 768 bytes each)
+EMBEDDING_CACHE_SIZE = 4096
+
+# Entries are stored at the precision document_chunks keeps vectors in
+# (halfvec), which queries are cast to as well, so nothing downstream
+# sees a difference
+CACHE_DTYPE = np.float16
+
+
+def text_key(text: str) -> str:
+    """Cache key for a text with no stable id of its own."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of embeddings keyed by (model name, key).
+
+    Keys default to the SHA-256 of the text; callers with a stable id
+    (e.g. DocumentChunk.id) can pass that instead to skip hashing.
+    Vectors are stored as float16; cached arrays are shared between
+    callers and must not be modified.
+    """
+
+    def __init__(self, maxsize: int = EMBEDDING_CACHE_SIZE):
+        self._entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+
+    def embed(
+        self,
+        model_name: str,
+        texts: Sequence[str],
+        compute: Callable[[List[str]], Iterable[np.ndarray]],
+        keys: Optional[Sequence[Hashable]] = None
+    ) -> List[np.ndarray]:
+        """
+        Embed texts, running `compute` only on the ones not cached.
+
+        Args:
+            model_name: Embedding model the vectors come from
+            texts: Texts to embed
+            compute: Embeds a list of texts, yielding one vector per text
+            keys: Per-text cache keys (defaults to text hashes)
+
+        Returns:
+            One float16 embedding per text, in input order
+        """
+        if keys is None:
+            keys = [text_key(text) for text in texts]
+        keys = [(model_name, key) for key in keys]
+
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                    embeddings[i] = embedding
+
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fresh = compute([texts[i] for i in missing])
+            with self._lock:
+                for i, embedding in zip(missing, fresh):
+                    embedding = np.asarray(embedding, dtype=CACHE_DTYPE)
+                    embeddings[i] = embedding
+                    self._entries[keys[i]] = embedding
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self._maxsize:
+                    self._entries.popitem(last=False)
+
+        return embeddings
+
+    def clear(self) -> None:
+        """Drop all cached embeddings."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Singleton instance for easy importing
+_cache_instance: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create the process-wide embedding cache."""
+    global _cache_instance
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = EmbeddingCache()
+    return _cache_instance
@@ -0,0 +1,152 @@
+"""
+MEXAR - Embedding Model Module
+One FastEmbed model per process, shared by retrieval, attribution,
+compilation and prompt analysis, plus the query batcher in front of it.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from fastembed import TextEmbedding
+
+logger = logging.getLogger(__name__)
+
+# Every stored chunk vector comes from this model (384 dim); changing it
+# means recompiling all agents. fastembed serves it from its quantized ONNX
+# export (qdrant/bge-small-en-v1.5-onnx-q) with ORT_ENABLE_ALL graph
+# optimizations, so embedding already runs the INT8 path.
+EMBEDDING_MODEL_NAME = "BAAI/bge-small-en-v1.5"
+
+# Dimension of its embeddings, stored in document_chunks as halfvec
+# (see migrations/halfvec_embeddings.sql)
+EMBEDDING_DIM = 384
+
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_model(model_name: str) -> "TextEmbedding":
+    # Imported here: fastembed loads ONNX Runtime
+    from fastembed import TextEmbedding
+
+    cache_dir = os.getenv("FASTEMBED_CACHE_PATH", "/tmp/.cache/fastembed")
+    model = TextEmbedding(model_name=model_name, cache_dir=cache_dir)
+    logger.info(f"FastEmbed {model_name} loaded (cache: {cache_dir})")
+    return model
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME) -> "TextEmbedding":
+    """
+    Get the shared embedding model, loading it on first use.
+
+    ONNX Runtime sessions can run from several threads at once, so one
+    instance serves every engine. Load failures are not cached; the
+    exception propagates and the next call tries again.
+    """
+    # Serialize loading so concurrent first calls don't each build a session
+    with _load_lock:
+        return _load_model(model_name)
+
+
+def embed_matrix(model: "TextEmbedding", texts: Sequence[str]) -> np.ndarray:
+    """
+    Embed texts into one preallocated (len(texts), EMBEDDING_DIM) float32
+    array, filled straight from the model's generator.
+    """
+    out = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for i, vector in enumerate(model.embed(list(texts))):
+        out[i] = vector
+    return out
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-query embedding requests into one model call.
+    
+    Callers block on a Future while a background thread drains the queue in
+    batches of up to `max_batch_size`, waiting at most `max_wait_ms` to fill one.
+    """
+    
+    def __init__(self, embedding_model, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedding_model = embedding_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def embed(self, query: str) -> np.ndarray:
+        """Embed a single query, sharing a model call with concurrent requests."""
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((query, future))
+        return future.result()
+    
+    def _ensure_worker(self):
+        # Restart the worker if an escaped BaseException killed it
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._worker.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                vectors = list(self.embedding_model.embed([q for q, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            except BaseException as e:
+                # Never leave callers blocked on a dying worker
+                for _, future in batch:
+                    future.set_exception(e)
+                raise
+            
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            for _, future in batch[len(vectors):]:
+                future.set_exception(RuntimeError(
+                    f"Embedding model returned {len(vectors)} vectors for {len(batch)} queries"
+                ))
+
+
+# One batcher (and worker thread) per model for the whole process
+_batchers: Dict[Any, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_embedding_batcher(model: "TextEmbedding") -> EmbeddingBatcher:
+    """
+    Get the process-wide batcher for a model.
+
+    Engines are created per request, so per-instance batchers would each
+    leak a worker thread and never see each other's queries.
+    """
+    with _batchers_lock:
+        batcher = _batchers.get(model)
+        if batcher is None:
+            batcher = _batchers[model] = EmbeddingBatcher(model)
+        return batcher
@@ -5,13 +5,34 @@ Provides a unified interface for all Groq API interactions.
 
 import os
 import base64
-from typing import Optional, List, Dict, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Iterator
+import httpx
+import orjson
 from groq import Groq
 from dotenv import load_dotenv
 
+from core.cache import SingleFlight
+from core.resilience import get_circuit_breaker, send_with_retry
+
 # Load environment variables
 load_dotenv()
 
+# Max deterministic (temperature 0) completions kept in memory
+RESPONSE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=64)
+def _json_extraction_prompt(schema_description: str) -> str:
+    """Build (once per schema) the system prompt used by extract_json."""
+    return f"""You are a JSON extraction assistant. 
+Extract structured data from the given text and return ONLY valid JSON.
+Expected structure: {schema_description}
+Do not include any explanation, only the JSON object."""
+
 
 class GroqClient:
     """
@@ -32,6 +53,16 @@ class GroqClient:
         
         self.client = Groq(api_key=self.api_key)
         
+        # Shared HTTP client for endpoints called directly (e.g. Whisper)
+        self._http = httpx.Client(timeout=60)
+        
+        # Identical in-flight vision requests share a single API call
+        self._vision_inflight = SingleFlight()
+        
+        # Cache of deterministic completions (only used when temperature == 0)
+        self._response_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+        
         # Model configurations (using fast model for better conversational responses)
         self.models = {
             "chat": "llama-3.1-8b-instant",  # Primary LLM (fast & conversational)
@@ -74,15 +105,65 @@ class GroqClient:
         if json_mode:
             kwargs["response_format"] = {"type": "json_object"}
         
+        # Sampling makes non-zero temperatures non-deterministic, so only
+        # greedy completions are safe to serve from cache
+        cache_key = None
+        if temperature == 0:
+            cache_key = hashlib.sha256(orjson.dumps(kwargs)).hexdigest()
+            with self._response_cache_lock:
+                cached = self._response_cache.get(cache_key)
+                if cached is not None:
+                    self._response_cache.move_to_end(cache_key)
+                    return cached
+        
         response = self.client.chat.completions.create(**kwargs)
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        
+        if cache_key is not None and content is not None:
+            with self._response_cache_lock:
+                self._response_cache[cache_key] = content
+                if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                    self._response_cache.popitem(last=False)
+        
+        return content
+    
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "chat",
+        temperature: float = 0.7,
+        max_tokens: int = 4096
+    ) -> Iterator[str]:
+        """
+        Stream a chat completion, yielding text as it is generated.
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            model: Model key from self.models
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Yields:
+            Pieces of the response text, in order
+        """
+        stream = self.client.chat.completions.create(
+            model=self.models.get(model, model),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
     
     def analyze_with_system_prompt(
         self,
         system_prompt: str,
         user_message: str,
         model: str = "chat",
-        json_mode: bool = False
+        json_mode: bool = False,
+        temperature: float = 0.7
     ) -> str:
         """
         Convenience method for system + user message pattern.
@@ -92,6 +173,7 @@ class GroqClient:
             user_message: User query
             model: Model to use
             json_mode: If True, force JSON output
+            temperature: Sampling temperature (0 enables response caching)
             
         Returns:
             Generated response
@@ -100,7 +182,9 @@ class GroqClient:
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message}
         ]
-        return self.chat_completion(messages, model=model, json_mode=json_mode)
+        return self.chat_completion(
+            messages, model=model, temperature=temperature, json_mode=json_mode
+        )
     
     def transcribe_audio(self, audio_path: str, language: str = "en") -> str:
         """
@@ -113,7 +197,6 @@ class GroqClient:
         Returns:
             Transcribed text
         """
-        import requests
         from pathlib import Path
         
         url = "https://api.groq.com/openai/v1/audio/transcriptions"
@@ -136,19 +219,25 @@ class GroqClient:
         }
         mime_type = mime_types.get(ext, "audio/mpeg")
         
+        # Read once up front so the multipart body can be resent on retry
         with open(audio_path, "rb") as audio_file:
-            files = {
-                "file": (audio_file_path.name, audio_file, mime_type)
-            }
-            data = {
-                "model": "whisper-large-v3-turbo",
-                "language": language
-            }
-            
-            response = requests.post(url, headers=headers, files=files, data=data, timeout=60)
+            audio_bytes = audio_file.read()
+        
+        files = {
+            "file": (audio_file_path.name, audio_bytes, mime_type)
+        }
+        data = {
+            "model": "whisper-large-v3-turbo",
+            "language": language
+        }
+        
+        response = send_with_retry(
+            "groq",
+            lambda: self._http.post(url, headers=headers, files=files, data=data)
+        )
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             return result.get("text", "")
         else:
             raise Exception(f"Groq Whisper API error: {response.status_code} - {response.text}")
@@ -218,25 +307,32 @@ class GroqClient:
             }
         ]
         
-        logger.info(f"[GROQ VISION] Calling Groq API with model: {self.models['vision']}")
-        
-        try:
-            response = self.client.chat.completions.create(
-                model=self.models["vision"],
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
+        def call_vision() -> str:
+            logger.info(f"[GROQ VISION] Calling Groq API with model: {self.models['vision']}")
             
-            result = response.choices[0].message.content
-            logger.info(f"[GROQ VISION] Success! Response length: {len(result)} chars")
-            logger.info(f"[GROQ VISION] Response preview: {result[:200]}...")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"[GROQ VISION] API call failed: {type(e).__name__}: {str(e)}")
-            raise
+            try:
+                # The Groq SDK retries transient errors itself; the breaker
+                # stops us hammering the API while it is down
+                response = get_circuit_breaker("groq").call(
+                    self.client.chat.completions.create,
+                    model=self.models["vision"],
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                )
+                
+                result = response.choices[0].message.content
+                logger.info(f"[GROQ VISION] Success! Response length: {len(result)} chars")
+                logger.info(f"[GROQ VISION] Response preview: {result[:200]}...")
+                
+                return result
+                
+            except Exception as e:
+                logger.error(f"[GROQ VISION] API call failed: {type(e).__name__}: {str(e)}")
+                raise
+        
+        inflight_key = f"{hashlib.sha256(image_bytes).hexdigest()}:{max_tokens}:{prompt}"
+        return self._vision_inflight.do(inflight_key, call_vision)
     
     def extract_json(self, text: str, schema_description: str) -> Dict[str, Any]:
         """
@@ -249,21 +345,15 @@ class GroqClient:
         Returns:
             Parsed JSON dictionary
         """
-        import json
-        
-        system_prompt = f"""You are a JSON extraction assistant. 
-Extract structured data from the given text and return ONLY valid JSON.
-Expected structure: {schema_description}
-Do not include any explanation, only the JSON object."""
-        
         response = self.analyze_with_system_prompt(
-            system_prompt=system_prompt,
+            system_prompt=_json_extraction_prompt(schema_description),
             user_message=text,
             model="fast",
-            json_mode=True
+            json_mode=True,
+            temperature=0
         )
         
-        return json.loads(response)
+        return orjson.loads(response)
 
 
 # Singleton instance for easy importing
@@ -4,12 +4,76 @@ Combines semantic (vector) search with keyword (full-text) search using RRF.
 """
 import logging
 from typing import List, Tuple, Optional
-from sqlalchemy import text
-from core.database import SessionLocal
+import numpy as np
+from sqlalchemy import Float, Integer, bindparam, cast, func, select, text
+from sqlalchemy.orm import Session
+from pgvector.sqlalchemy import BIT, HALFVEC
 from models.chunk import DocumentChunk
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_model import EMBEDDING_DIM, get_embedding_batcher
 
 logger = logging.getLogger(__name__)
 
+# Binary-quantized candidates recalled per requested result before cosine rescoring
+RESCORE_MULTIPLIER = 10
+
+
+class SearchSchemaError(RuntimeError):
+    """The database hasn't been migrated to the schema the search SQL expects."""
+
+
+# Search binds halfvec query embeddings and quantizes the embedding column
+# with binary_quantize(), both of which need these migrations applied
+_SCHEMA_MIGRATIONS = "migrations/halfvec_embeddings.sql and migrations/binary_quantized_search.sql"
+
+
+def verify_search_schema(conn) -> None:
+    """
+    Check that the database matches the statements HybridSearcher runs.
+    
+    Args:
+        conn: Open SQLAlchemy connection (non-PostgreSQL databases are skipped)
+    
+    Raises:
+        SearchSchemaError: If document_chunks.embedding is not halfvec, or
+            hybrid_search() still takes a vector query embedding
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    
+    column_type = conn.execute(text("""
+        SELECT udt_name FROM information_schema.columns
+        WHERE table_name = 'document_chunks' AND column_name = 'embedding'
+    """)).scalar()
+    if column_type is not None and column_type != "halfvec":
+        raise SearchSchemaError(
+            f"document_chunks.embedding is {column_type}, but search expects halfvec. "
+            f"Apply {_SCHEMA_MIGRATIONS}."
+        )
+    
+    signatures = conn.execute(text("""
+        SELECT pg_get_function_identity_arguments(oid) FROM pg_proc
+        WHERE proname = 'hybrid_search'
+    """)).scalars().all()
+    if not signatures:
+        # search() falls back to semantic-only search without the function
+        logger.warning("hybrid_search() is not installed; search will be semantic-only")
+    elif not any("halfvec" in signature for signature in signatures):
+        raise SearchSchemaError(
+            f"hybrid_search() takes ({signatures[0]}), but search passes a halfvec "
+            f"embedding. Apply {_SCHEMA_MIGRATIONS}."
+        )
+
+
+def binary_quantize(embedding: List[float]) -> str:
+    """
+    Quantize an embedding to a bit string (1 where the component is positive).
+    
+    Matches pgvector's binary_quantize(), so the query can be compared by
+    Hamming distance against the bit index on document_chunks.
+    """
+    return "".join("1" if x > 0 else "0" for x in embedding)
+
 
 class HybridSearcher:
     """
@@ -19,6 +83,52 @@ class HybridSearcher:
     3. Reciprocal Rank Fusion (RRF) to merge results
     """
     
+    # Statements are built once and reused with new parameters per query.
+    # Call the hybrid_search function created in migration and join the
+    # ranked ids back to document_chunks in the same query.
+    # Use CAST syntax to avoid clashing with SQLAlchemy bind parameters (:: is often parsed as a parameter)
+    _ranked = text("""
+        SELECT id, rrf_score FROM hybrid_search(
+            CAST(:embedding AS halfvec),
+            :query_text,
+            :agent_id,
+            :match_count
+        )
+    """).bindparams(
+        bindparam("embedding", type_=HALFVEC(EMBEDDING_DIM)),
+        bindparam("query_text"),
+        bindparam("agent_id", type_=Integer),
+        bindparam("match_count", type_=Integer),
+    ).columns(id=Integer, rrf_score=Float).subquery("ranked")
+    
+    _hybrid_stmt = (
+        select(DocumentChunk, _ranked.c.rrf_score)
+        .join(_ranked, DocumentChunk.id == _ranked.c.id)
+        .order_by(_ranked.c.rrf_score.desc())
+    )
+    
+    # Two-stage semantic search: recall candidates by Hamming distance over
+    # 1-bit codes (served by the bit index), then rescore them by cosine
+    _binary_candidates = (
+        select(DocumentChunk.id)
+        .where(DocumentChunk.agent_id == bindparam("agent_id", type_=Integer))
+        .order_by(
+            cast(func.binary_quantize(DocumentChunk.embedding), BIT(EMBEDDING_DIM))
+            .hamming_distance(bindparam("query_bits", type_=BIT(EMBEDDING_DIM)))
+        )
+        .limit(bindparam("candidate_count", type_=Integer))
+        .subquery("candidates")
+    )
+    
+    _semantic_stmt = (
+        select(DocumentChunk)
+        .join(_binary_candidates, DocumentChunk.id == _binary_candidates.c.id)
+        .order_by(DocumentChunk.embedding.cosine_distance(
+            bindparam("embedding", type_=HALFVEC(EMBEDDING_DIM))
+        ))
+        .limit(bindparam("match_count", type_=Integer))
+    )
+    
     def __init__(self, embedding_model):
         """
         Initialize hybrid searcher.
@@ -27,20 +137,49 @@ class HybridSearcher:
             embedding_model: FastEmbed model for query embedding
         """
         self.embedding_model = embedding_model
+        self._model_name = getattr(embedding_model, "model_name", type(embedding_model).__name__)
+        # Shared by every searcher, so concurrent requests batch together
+        self._batcher = get_embedding_batcher(embedding_model)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, reusing cached vectors for repeated questions.
+        
+        Vectors live in the process-wide embedding cache, so they survive
+        across searcher instances. Case and whitespace are normalized before
+        lookup; bge-small-en-v1.5 uses an uncased tokenizer, so lowercasing
+        does not change the vector.
+        """
+        normalized_query = " ".join(query.lower().split())
+        embedding, = get_embedding_cache().embed(
+            self._model_name, [normalized_query], self._compute_embeddings
+        )
+        return embedding.tolist()
+    
+    def _compute_embeddings(self, queries: List[str]) -> List[np.ndarray]:
+        return [self._batcher.embed(query) for query in queries]
     
     def search(
         self, 
         query: str, 
         agent_id: int, 
-        top_k: int = 20
+        db: Session,
+        top_k: int = 20,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Tuple[DocumentChunk, float]]:
         """
         Perform hybrid search using Supabase RPC function.
         
+        The semantic and keyword branches run together inside the
+        hybrid_search SQL function, in a single round-trip.
+        
         Args:
             query: User's search query
             agent_id: ID of the agent to search within
+            db: Request-scoped database session
             top_k: Number of results to return
+            query_embedding: Embedding of `query` if already computed
+                (see embed_query); generated here otherwise
             
         Returns:
             List of (DocumentChunk, rrf_score) tuples
@@ -50,97 +189,70 @@ class HybridSearcher:
         
         try:
             # Generate query embedding
-            query_embedding = list(self.embedding_model.embed([query]))[0].tolist()
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
+            
+            # Rows arrive hydrated and already in rank order; Row objects
+            # unpack like (chunk, score) tuples, so no copy is needed
+            results = db.execute(self._hybrid_stmt, {
+                "embedding": query_embedding,
+                "query_text": query,
+                "agent_id": agent_id,
+                "match_count": top_k
+            }).tuples().all()
+            
+            if not results:
+                # Fallback to pure semantic search if hybrid returns nothing
+                return self._semantic_only_search(db, query_embedding, agent_id, top_k)
+            
+            logger.info(f"Hybrid search found {len(results)} results for agent {agent_id}")
+            return results
             
-            db = SessionLocal()
-            try:
-                # Call the hybrid_search function created in migration
-                # Use CAST syntax to avoid clashing with SQLAlchemy bind parameters (:: is often parsed as a parameter)
-                result = db.execute(text("""
-                    SELECT * FROM hybrid_search(
-                        CAST(:embedding AS vector),
-                        :query_text,
-                        :agent_id,
-                        :match_count
-                    )
-                """), {
-                    "embedding": query_embedding,
-                    "query_text": query,
-                    "agent_id": agent_id,
-                    "match_count": top_k
-                })
-                
-                rows = result.fetchall()
-                
-                if not rows:
-                    # Fallback to pure semantic search if hybrid returns nothing
-                    return self._semantic_only_search(db, query_embedding, agent_id, top_k)
-                
-                # Fetch full chunk objects
-                chunk_ids = [row.id for row in rows]
-                chunks = db.query(DocumentChunk).filter(
-                    DocumentChunk.id.in_(chunk_ids)
-                ).all()
-                chunk_map = {c.id: c for c in chunks}
-                
-                # Return chunks with RRF scores, maintaining order
-                results = []
-                for row in rows:
-                    if row.id in chunk_map:
-                        results.append((chunk_map[row.id], row.rrf_score))
-                
-                logger.info(f"Hybrid search found {len(results)} results for agent {agent_id}")
-                return results
-            finally:
-                db.close()
-                
         except Exception as e:
             logger.error(f"Hybrid search failed: {e}")
-            # Fallback to simple semantic search
-            return self._fallback_semantic_search(query, agent_id, top_k)
+            # A failed statement aborts the transaction; reset it before reusing the session
+            db.rollback()
+            # Fallback to simple semantic search, reusing the embedding if we got that far
+            return self._fallback_semantic_search(query, agent_id, db, top_k, query_embedding)
     
     def _semantic_only_search(
         self, 
-        db, 
+        db: Session, 
         query_embedding: List[float], 
         agent_id: int, 
         top_k: int
     ) -> List[Tuple[DocumentChunk, float]]:
         """Pure semantic search fallback."""
         try:
-            chunks = db.query(DocumentChunk).filter(
-                DocumentChunk.agent_id == agent_id
-            ).order_by(
-                DocumentChunk.embedding.cosine_distance(query_embedding)
-            ).limit(top_k).all()
+            chunks = db.execute(self._semantic_stmt, {
+                "embedding": query_embedding,
+                "query_bits": binary_quantize(query_embedding),
+                "agent_id": agent_id,
+                "candidate_count": top_k * RESCORE_MULTIPLIER,
+                "match_count": top_k
+            }).scalars().all()
             
-            # Calculate similarity scores (1 - distance)
-            results = []
-            for i, chunk in enumerate(chunks):
-                # Approximate score based on rank
-                score = 1.0 / (1 + i * 0.1)
-                results.append((chunk, score))
-            
-            return results
+            # Approximate score based on rank
+            return [(chunk, 1.0 / (1 + i * 0.1)) for i, chunk in enumerate(chunks)]
         except Exception as e:
             logger.error(f"Semantic search failed: {e}")
+            db.rollback()
             return []
     
     def _fallback_semantic_search(
         self, 
         query: str, 
         agent_id: int, 
-        top_k: int
+        db: Session,
+        top_k: int,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Tuple[DocumentChunk, float]]:
         """Fallback when hybrid search function not available."""
         try:
-            query_embedding = list(self.embedding_model.embed([query]))[0].tolist()
+            if query_embedding is None:
+                query_embedding = self.embed_query(query)
             
-            db = SessionLocal()
-            try:
-                return self._semantic_only_search(db, query_embedding, agent_id, top_k)
-            finally:
-                db.close()
+            return self._semantic_only_search(db, query_embedding, agent_id, top_k)
         except Exception as e:
             logger.error(f"Fallback search failed: {e}")
             return []
@@ -5,12 +5,21 @@ Provides inline citations for full transparency.
 """
 import re
 import logging
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
 from dataclasses import dataclass, field
 import numpy as np
 
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_model import embed_matrix
+
 logger = logging.getLogger(__name__)
 
+# Sentence-ending punctuation followed by whitespace
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Shorter sentences are not substantive enough to attribute
+MIN_SENTENCE_WORDS = 4
+
 
 @dataclass
 class AttributedSentence:
@@ -49,12 +58,13 @@ class SourceAttributor:
             embedding_model: FastEmbed model for sentence embedding
         """
         self.embedding_model = embedding_model
+        self._model_name = getattr(embedding_model, "model_name", type(embedding_model).__name__)
     
     def attribute(
         self, 
         answer: str, 
         chunks: List[Any],
-        chunk_embeddings: List[np.ndarray] = None
+        chunk_embeddings: Optional[np.ndarray] = None
     ) -> AttributedAnswer:
         """
         Attribute each sentence in answer to source chunks.
@@ -62,7 +72,7 @@ class SourceAttributor:
         Args:
             answer: LLM generated answer
             chunks: Retrieved DocumentChunk objects  
-            chunk_embeddings: Pre-computed embeddings (optional)
+            chunk_embeddings: Pre-computed embeddings, one row per chunk (optional)
             
         Returns:
             AttributedAnswer with citations
@@ -74,137 +84,190 @@ class SourceAttributor:
                 sources=[]
             )
         
-        # Split answer into sentences
-        sentences = self._split_sentences(answer)
+        # Split answer into sentences, keeping where each one sits
+        spans = self._sentence_spans(answer)
         
-        # Compute chunk embeddings if not provided
+        # Read each chunk's fields once, into lists indexed by chunk position
+        chunk_ids = [self._get_id(c) for c in chunks]
+        contents = [self._get_content(c) for c in chunks]
+        previews = [content[:150] for content in contents]
+        source_files = [self._get_source(c) for c in chunks]
+        
+        # Compute chunk embeddings if not provided; chunks retrieved again
+        # on later turns come back from the content-keyed cache
         if chunk_embeddings is None and self.embedding_model:
-            contents = [self._get_content(c) for c in chunks]
-            chunk_embeddings = list(self.embedding_model.embed(contents))
+            chunk_embeddings = np.stack(self._embed_cached(contents))
+        
+        # Skip very short or non-substantive sentences
+        spans = [
+            (start, end) for start, end in spans
+            if len(answer[start:end].split()) >= MIN_SENTENCE_WORDS
+        ]
+        sentences = [answer[start:end] for start, end in spans]
+        
+        # Find best matching chunk for every sentence at once
+        best_sources = self._find_best_sources(sentences, len(chunks), chunk_embeddings)
         
         # Track which sources we've cited
         sources_used = {}  # chunk_id -> citation_number
         attributed_sentences = []
+        sources = []  # for display, in citation order
         
-        for sentence in sentences:
-            # Skip very short or non-substantive sentences
-            if len(sentence.split()) < 4:
-                continue
-            
-            # Find best matching chunk
-            best_chunk, similarity = self._find_best_source(
-                sentence, chunks, chunk_embeddings
-            )
-            
+        for sentence, (index, similarity) in zip(sentences, best_sources):
             # Assign citation number
-            chunk_id = self._get_id(best_chunk)
-            if chunk_id not in sources_used:
-                sources_used[chunk_id] = len(sources_used) + 1
-            citation_num = sources_used[chunk_id]
+            chunk_id = chunk_ids[index]
+            citation_num = sources_used.get(chunk_id)
+            first_citation = citation_num is None
+            if first_citation:
+                citation_num = sources_used[chunk_id] = len(sources_used) + 1
             
             attributed_sentences.append(AttributedSentence(
                 text=sentence,
                 citation=f"[{citation_num}]",
                 source_chunk_id=chunk_id,
-                source_preview=self._get_content(best_chunk)[:150],
-                source_file=self._get_source(best_chunk),
+                source_preview=previews[index],
+                source_file=source_files[index],
                 similarity=similarity
             ))
-        
-        # Build answer with inline citations
-        answer_with_citations = self._build_cited_answer(answer, attributed_sentences)
-        
-        # Build sources list for display
-        sources = []
-        for chunk_id, num in sorted(sources_used.items(), key=lambda x: x[1]):
-            # Find the attributed sentence for this chunk
-            attr = next((a for a in attributed_sentences if a.source_chunk_id == chunk_id), None)
-            if attr:
+            
+            # A source is listed with the first sentence citing it
+            if first_citation:
                 sources.append({
-                    "citation": f"[{num}]",
+                    "citation": f"[{citation_num}]",
                     "chunk_id": chunk_id,
-                    "source": attr.source_file,
-                    "preview": attr.source_preview,
-                    "similarity": round(attr.similarity, 3)
+                    "source": source_files[index],
+                    "preview": previews[index],
+                    "similarity": round(similarity, 3)
                 })
         
+        # Build answer with inline citations
+        answer_with_citations = self._build_cited_answer(answer, spans, attributed_sentences)
+        
         return AttributedAnswer(
             answer_with_citations=answer_with_citations,
             sentences=attributed_sentences,
             sources=sources
         )
     
-    def _split_sentences(self, text: str) -> List[str]:
-        """Split text into sentences."""
-        # Split on sentence-ending punctuation followed by space
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+    def _sentence_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Split text into sentences, as (start, end) offsets of each stripped sentence."""
+        spans = []
+        start = 0
+        for boundary in _SENTENCE_BOUNDARY.finditer(text):
+            self._append_stripped_span(text, start, boundary.start(), spans)
+            start = boundary.end()
+        self._append_stripped_span(text, start, len(text), spans)
+        return spans
+    
+    def _append_stripped_span(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        spans: List[Tuple[int, int]]
+    ) -> None:
+        """Append text[start:end] without surrounding whitespace, if anything is left."""
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            start += len(piece) - len(piece.lstrip())
+            spans.append((start, start + len(stripped)))
+    
+    def split_complete_sentences(self, partial_text: str) -> Tuple[List[str], str]:
+        """
+        Split a partial (still streaming) answer at its sentence boundaries.
+        
+        Boundaries already seen never move as more text arrives, so every
+        piece but the last is a final sentence of the answer.
+        
+        Returns:
+            The complete substantive sentences, and the unfinished remainder
+        """
+        *complete, remainder = _SENTENCE_BOUNDARY.split(partial_text)
+        sentences = [s.strip() for s in complete]
+        return [s for s in sentences if len(s.split()) >= MIN_SENTENCE_WORDS], remainder
+    
+    def embed_sentences(self, sentences: List[str]) -> List[np.ndarray]:
+        """Embed sentences through the shared cache, so early calls warm attribution."""
+        return self._embed_cached(sentences)
     
-    def _find_best_source(
+    def _embed_cached(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts, reusing cached vectors keyed by content hash."""
+        return get_embedding_cache().embed(
+            self._model_name,
+            texts,
+            lambda missing: embed_matrix(self.embedding_model, missing)
+        )
+    
+    def _find_best_sources(
         self, 
-        sentence: str, 
-        chunks: List[Any],
-        chunk_embeddings: List[np.ndarray]
-    ) -> Tuple[Any, float]:
-        """Find the chunk most similar to the sentence."""
-        if not chunks:
-            return None, 0.0
+        sentences: List[str], 
+        n_chunks: int,
+        chunk_embeddings: Optional[np.ndarray]
+    ) -> List[Tuple[int, float]]:
+        """Find the index of the chunk most similar to each sentence, with its similarity."""
+        if not sentences:
+            return []
         
         # Default to first chunk if no embeddings
-        if not self.embedding_model or not chunk_embeddings:
-            return chunks[0], 0.5
+        if not self.embedding_model or chunk_embeddings is None or len(chunk_embeddings) == 0:
+            return [(0, 0.5)] * len(sentences)
         
         try:
-            # Embed the sentence
-            sentence_emb = list(self.embedding_model.embed([sentence]))[0]
-            
-            # Find best match
-            best_chunk = chunks[0]
-            best_sim = 0.0
-            
-            for chunk, emb in zip(chunks, chunk_embeddings):
-                sim = self._cosine_similarity(sentence_emb, emb)
-                if sim > best_sim:
-                    best_sim = sim
-                    best_chunk = chunk
-            
-            return best_chunk, best_sim
+            # Embed all sentences in one model call; the stacked matrix is
+            # ours, so it is normalized without copying it again
+            sentence_matrix = self._normalize_rows(
+                np.stack(self.embed_sentences(sentences)), copy=False
+            )
+            n_chunks = min(n_chunks, len(chunk_embeddings))
+            chunk_matrix = self._normalize_rows(chunk_embeddings[:n_chunks])
             
+            # Cosine similarity of every (sentence, chunk) pair
+            scores = sentence_matrix @ chunk_matrix.T
+            best_indices = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(scores)), best_indices]
         except Exception as e:
             logger.warning(f"Embedding failed in attribution: {e}")
-            return chunks[0], 0.5
+            return [(0, 0.5)] * len(sentences)
+        
+        # No positive similarity: fall back to the first chunk
+        return [
+            (index, score) if score > 0 else (0, 0.0)
+            for index, score in zip(best_indices.tolist(), best_scores.tolist())
+        ]
     
-    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors."""
-        try:
-            dot = np.dot(a, b)
-            norm_a = np.linalg.norm(a)
-            norm_b = np.linalg.norm(b)
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            return float(dot / (norm_a * norm_b))
-        except:
-            return 0.0
+    def _normalize_rows(self, matrix: np.ndarray, copy: bool = True) -> np.ndarray:
+        """
+        L2-normalize each row, leaving zero vectors at zero.
+        
+        By default a single float32 copy is normalized, leaving the input
+        (which may be shared, cached embeddings) untouched; copy=False
+        normalizes a float32 input in place (anything else is converted).
+        """
+        matrix = np.array(matrix, dtype=np.float32) if copy else np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
     
     def _build_cited_answer(
         self, 
         answer: str, 
+        spans: List[Tuple[int, int]],
         attributed: List[AttributedSentence]
     ) -> str:
-        """Insert citations after sentences in the answer."""
-        result = answer
-        
-        # Process in reverse order to preserve positions
-        for attr in reversed(attributed):
-            # Add citation after the sentence
-            if attr.text in result:
-                result = result.replace(
-                    attr.text, 
-                    f"{attr.text} {attr.citation}",
-                    1  # Only replace first occurrence
-                )
-        
-        return result
+        """Insert citations after sentences in the answer, in one pass."""
+        parts = []
+        copied = 0
+        
+        # Copy the answer up to the end of each sentence, then its citation
+        for (_, end), attr in zip(spans, attributed):
+            parts.append(answer[copied:end])
+            parts.append(f" {attr.citation}")
+            copied = end
+        parts.append(answer[copied:])
+        
+        return "".join(parts)
     
     def _get_content(self, chunk) -> str:
         """Extract content from chunk object."""
@@ -1,17 +1,28 @@
 
+import time
 import threading
 from pathlib import Path
-from typing import Optional, Callable
+from typing import Optional, Callable, Tuple
 from datetime import datetime
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 import logging
 
 from models.agent import Agent, CompilationJob
+from core.cache import invalidate_agent_data
 from modules.knowledge_compiler import KnowledgeCompiler, create_knowledge_compiler
 from modules.prompt_analyzer import PromptAnalyzer, create_prompt_analyzer
 
 logger = logging.getLogger(__name__)
 
+# Progress updates closer together than this (seconds) are coalesced
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+# Compilations running at once; each embedding batch already uses every
+# core through ONNX Runtime, so more would only contend for CPU and memory
+MAX_CONCURRENT_COMPILATIONS = 2
+_compilation_slots = threading.BoundedSemaphore(MAX_CONCURRENT_COMPILATIONS)
+
 
 def _run_compilation_thread(
     agent_id: int,
@@ -20,35 +31,39 @@ def _run_compilation_thread(
     system_prompt: str,
     files_data: list
 ):
-    """Execute the compilation process in a separate thread."""
+    """
+    Execute the compilation process in a separate thread.
+    
+    Sessions are opened only around each read or write, so the thread does
+    not hold a pool connection for the minutes the compilation takes.
+    """
     from core.database import SessionLocal
     
-    db = SessionLocal()
-    job = None
-    agent = None
+    progress = _ProgressReporter(job_id)
     
     try:
-        job = db.query(CompilationJob).filter(CompilationJob.id == job_id).first()
-        agent = db.query(Agent).filter(Agent.id == agent_id).first()
+        with SessionLocal() as db:
+            job_found = db.query(CompilationJob.id).filter(CompilationJob.id == job_id).scalar() is not None
+            agent_name = db.query(Agent.name).filter(Agent.id == agent_id).scalar()
         
-        if not job or not agent:
+        if not job_found or agent_name is None:
             logger.error(f"Job or agent not found: job_id={job_id}, agent_id={agent_id}")
             return
         
-        logger.info(f"Starting compilation for agent {agent.name}")
+        logger.info(f"Starting compilation for agent {agent_name}")
         
         # Step 1: Analyze prompt (10%)
-        _update_progress(db, job, 10, "Analyzing system prompt")
+        progress.update(10, "Analyzing system prompt")
         analyzer = create_prompt_analyzer()
         prompt_analysis = analyzer.analyze_prompt(system_prompt)
         logger.info(f"Prompt analysis complete: domain={prompt_analysis.get('domain')}")
         
         # Step 2: Initialize compiler (20%)
-        _update_progress(db, job, 20, "Initializing knowledge compiler")
+        progress.update(20, "Initializing knowledge compiler")
         compiler = create_knowledge_compiler(str(Path(storage_path).parent))
         
         # Step 3: Compile knowledge (20-80%)
-        _update_progress(db, job, 30, "Compiling knowledge base")
+        progress.update(30, "Compiling knowledge base")
         logger.info(f"Starting compilation with {len(files_data)} files")
         
         # Parse files into the expected format
@@ -66,7 +81,7 @@ def _run_compilation_thread(
         # Run compilation with error handling
         try:
             result = compiler.compile(
-                agent_name=agent.name,
+                agent_name=agent_name,
                 parsed_data=parsed_data,
                 system_prompt=system_prompt,
                 prompt_analysis=prompt_analysis
@@ -77,65 +92,132 @@ def _run_compilation_thread(
             # Continue even if compilation has issues - embeddings may still be created
             result = {"stats": {}, "domain_signature": []}
         
-        _update_progress(db, job, 80, "Saving to vector store")
+        # compile() returns once metadata is saved; chunks are embedded and
+        # written in the background, so wait before marking the agent ready
+        progress.update(80, "Saving to vector store")
+        compiler.wait_for_vector_index()
         
         # Step 4: Update agent metadata (90%)
-        _update_progress(db, job, 90, "Updating agent metadata")
-        
-        agent.status = "ready"
-        agent.domain = prompt_analysis.get("domain", "general")
-        agent.domain_keywords = prompt_analysis.get("domain_keywords", [])
-        agent.entity_count = result.get("stats", {}).get("total_entries", 0)
+        progress.update(90, "Updating agent metadata")
         
-        # Step 5: Complete (100%)
-        job.status = "completed"
-        job.progress = 100
-        job.current_step = "Compilation complete"
-        job.completed_at = datetime.utcnow()
-        
-        db.commit()
-        logger.info(f"Agent {agent.name} compilation completed successfully")
+        # The completion write below supersedes any coalesced update
+        progress.cancel()
+        with SessionLocal() as db:
+            db.query(Agent).filter(Agent.id == agent_id).update({
+                Agent.status: "ready",
+                Agent.domain: prompt_analysis.get("domain", "general"),
+                Agent.domain_keywords: list(prompt_analysis.get("domain_keywords", [])),
+                Agent.entity_count: result.get("stats", {}).get("total_entries", 0)
+            }, synchronize_session=False)
+            
+            # Step 5: Complete (100%)
+            db.query(CompilationJob).filter(CompilationJob.id == job_id).update({
+                CompilationJob.status: "completed",
+                CompilationJob.progress: 100,
+                CompilationJob.current_step: "Compilation complete",
+                CompilationJob.completed_at: datetime.utcnow()
+            }, synchronize_session=False)
+            
+            db.commit()
+        invalidate_agent_data(agent_name, agent_id)
+        logger.info(f"Agent {agent_name} compilation completed successfully")
             
     except Exception as e:
         logger.error(f"Compilation failed for job {job_id}: {str(e)}", exc_info=True)
         
         # CRITICAL: Always update job and agent status on error
+        progress.cancel()
         try:
-            if not job:
-                job = db.query(CompilationJob).filter(CompilationJob.id == job_id).first()
-            if not agent:
-                agent = db.query(Agent).filter(Agent.id == agent_id).first()
-            
-            if job:
-                job.status = "failed"
-                job.error_message = str(e)[:500]  # Limit error message length
-                job.completed_at = datetime.utcnow()
-                logger.error(f"Job {job_id} marked as failed")
-            
-            if agent:
-                agent.status = "failed"
-                logger.error(f"Agent {agent_id} marked as failed")
-            
-            db.commit()
+            with SessionLocal() as db:
+                if db.query(CompilationJob).filter(CompilationJob.id == job_id).update({
+                    CompilationJob.status: "failed",
+                    CompilationJob.error_message: str(e)[:500],  # Limit error message length
+                    CompilationJob.completed_at: datetime.utcnow()
+                }, synchronize_session=False):
+                    logger.error(f"Job {job_id} marked as failed")
+                
+                if db.query(Agent).filter(Agent.id == agent_id).update(
+                    {Agent.status: "failed"}, synchronize_session=False
+                ):
+                    logger.error(f"Agent {agent_id} marked as failed")
+                
+                db.commit()
         except Exception as update_error:
+            # Leaving the session block rolls back the failed transaction
             logger.error(f"Failed to update error status: {update_error}")
-            db.rollback()
-            
-    finally:
-        # CRITICAL: Ensure database connection is closed
-        try:
-            db.close()
-            logger.info(f"Database connection closed for job {job_id}")
-        except Exception as close_error:
-            logger.error(f"Error closing database: {close_error}")
 
 
-def _update_progress(db: Session, job: CompilationJob, progress: int, step: str):
-    """Update job progress."""
-    job.progress = progress
-    job.current_step = step
-    db.commit()
-    logger.info(f"Job {job.id} progress: {progress}% - {step}")
+def _run_compilation_when_free(*args):
+    """Run a compilation once one of the concurrent compilation slots is free."""
+    with _compilation_slots:
+        _run_compilation_thread(*args)
+
+
+class _ProgressReporter:
+    """
+    Writes a compilation job's progress, coalescing updates that arrive
+    within PROGRESS_FLUSH_INTERVAL of the last write.
+    
+    A coalesced update is written by a timer once the interval has passed,
+    so the latest step always reaches the database.
+    """
+    
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self._pending: Optional[Tuple[int, str]] = None
+        self._last_write = float("-inf")
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+    
+    def update(self, progress: int, step: str):
+        """Record progress, writing it now or once the interval has passed."""
+        logger.info(f"Job {self.job_id} progress: {progress}% - {step}")
+        with self._lock:
+            self._pending = (progress, step)
+            wait = self._last_write + PROGRESS_FLUSH_INTERVAL - time.monotonic()
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self.flush()
+    
+    def flush(self):
+        """Write the latest pending progress, if any."""
+        # Writes happen under the lock so they reach the database in order
+        with self._lock:
+            self._timer = None
+            if self._pending is None:
+                return
+            progress, step = self._pending
+            self._pending = None
+            try:
+                _write_progress(self.job_id, progress, step)
+            except Exception as e:
+                # Progress is informational; never fail the compilation over it
+                logger.warning(f"Failed to update progress for job {self.job_id}: {e}")
+            self._last_write = time.monotonic()
+    
+    def cancel(self):
+        """Drop any pending update (a final status write supersedes it)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+
+
+def _write_progress(job_id: int, progress: int, step: str):
+    """Write job progress with a single Core UPDATE in its own transaction."""
+    from core.database import engine
+    
+    with engine.begin() as conn:
+        conn.execute(
+            update(CompilationJob)
+            .where(CompilationJob.id == job_id)
+            .values(progress=progress, current_step=step)
+        )
 
 
 class CompilationWorker:
@@ -171,7 +253,7 @@ class CompilationWorker:
         
         # Start background thread
         thread = threading.Thread(
-            target=_run_compilation_thread,
+            target=_run_compilation_when_free,
             args=(agent.id, job.id, agent.storage_path, agent.system_prompt, files_data),
             daemon=True
         )
@@ -3,13 +3,14 @@ MEXAR Agents API - Phase 2
 Handles agent CRUD operations and knowledge graph data.
 """
 
-import json
 import logging
-from typing import List, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, ConfigDict
 
@@ -22,6 +23,102 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/agents", tags=["agents"])
 
+# Parsed metadata.json and serialized D3 graphs per path, keyed on the file's mtime
+_METADATA_CACHE: Dict[str, Tuple[float, Any]] = {}
+_GRAPH_CACHE: Dict[str, Tuple[float, Any]] = {}
+_FILE_CACHE_LOCK = threading.Lock()
+
+
+def _load_cached(
+    path: Path,
+    cache: Dict[str, Tuple[float, Any]],
+    build: Callable[[bytes], Any]
+) -> Any:
+    """
+    Build a value from a file's contents, rebuilding only when its mtime changes.
+    
+    Returns None if the file does not exist. If the file cannot be stat'ed
+    for another reason, the last cached value is served instead.
+    """
+    key = str(path)
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        with _FILE_CACHE_LOCK:
+            cache.pop(key, None)
+        return None
+    except OSError:
+        cached = cache.get(key)
+        if cached is None:
+            raise
+        return cached[1]
+    
+    cached = cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    value = build(path.read_bytes())
+    
+    with _FILE_CACHE_LOCK:
+        cache[key] = (mtime, value)
+    return value
+
+
+def _load_metadata(path: Path) -> Optional[dict]:
+    """Load an agent's metadata.json (cached until the file changes)."""
+    return _load_cached(path, _METADATA_CACHE, orjson.loads)
+
+
+def _build_d3_graph(raw: bytes) -> bytes:
+    """Convert knowledge_graph.json contents to serialized D3.js nodes/links."""
+    graph_data = orjson.loads(raw)
+    
+    # Keyed by id so duplicates are dropped while keeping first-seen order
+    nodes_by_id = {}
+    links = []
+    # Each distinct node type is hashed once
+    type_group = {}
+    
+    # Extract nodes from graph data
+    for node in graph_data.get("nodes", ()):
+        node_id = node.get("id", str(node))
+        if node_id not in nodes_by_id:
+            node_type = node.get("type", "entity")
+            group = type_group.get(node_type)
+            if group is None:
+                group = type_group[node_type] = hash(node_type) % 10
+            nodes_by_id[node_id] = {
+                "id": node_id,
+                "label": node.get("label", node_id),
+                "type": node_type,
+                "group": group
+            }
+    
+    # Extract links/edges
+    if "edges" in graph_data:
+        for edge in graph_data["edges"]:
+            source = edge.get("source", edge.get("from"))
+            target = edge.get("target", edge.get("to"))
+            if source and target:
+                links.append({
+                    "source": source,
+                    "target": target,
+                    "label": edge.get("relation", edge.get("label", "")),
+                    "weight": edge.get("weight", 1)
+                })
+    elif "links" in graph_data:
+        links = graph_data["links"]
+    
+    nodes = list(nodes_by_id.values())
+    return orjson.dumps({
+        "nodes": nodes,
+        "links": links,
+        "stats": {
+            "node_count": len(nodes),
+            "link_count": len(links)
+        }
+    })
+
 
 # ===== PYDANTIC MODELS =====
 
@@ -57,11 +154,9 @@ def list_agents(
         stats = {}
         if agent.storage_path:
             try:
-                metadata_path = Path(agent.storage_path) / "metadata.json"
-                if metadata_path.exists():
-                    with open(metadata_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        stats = data.get("stats", {})
+                data = _load_metadata(Path(agent.storage_path) / "metadata.json")
+                if data is not None:
+                    stats = data.get("stats", {})
             except Exception as e:
                 logger.warning(f"Failed to load stats for agent {agent.name}: {e}")
         
@@ -132,14 +227,13 @@ def get_agent_details(
         storage_path = Path(agent.storage_path)
         metadata_file = storage_path / "metadata.json"
         
-        if metadata_file.exists():
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
+        try:
+            metadata = _load_metadata(metadata_file)
+            if metadata is not None:
                 response["metadata"] = metadata
                 response["stats"] = metadata.get("stats", {})
-            except Exception as e:
-                logger.warning(f"Failed to load metadata for {agent_name}: {e}")
+        except Exception as e:
+            logger.warning(f"Failed to load metadata for {agent_name}: {e}")
     
     return response
 
@@ -171,61 +265,20 @@ def get_agent_graph(
     storage_path = Path(agent.storage_path)
     graph_file = storage_path / "knowledge_graph.json"
     
-    if not graph_file.exists():
-        raise HTTPException(status_code=404, detail="Knowledge graph not found")
-    
     try:
-        with open(graph_file, 'r', encoding='utf-8') as f:
-            graph_data = json.load(f)
-        
-        # Convert to D3.js format
-        nodes = []
-        links = []
-        node_ids = set()
-        
-        # Extract nodes from graph data
-        if "nodes" in graph_data:
-            for node in graph_data["nodes"]:
-                node_id = node.get("id", str(node))
-                if node_id not in node_ids:
-                    nodes.append({
-                        "id": node_id,
-                        "label": node.get("label", node_id),
-                        "type": node.get("type", "entity"),
-                        "group": hash(node.get("type", "entity")) % 10
-                    })
-                    node_ids.add(node_id)
-        
-        # Extract links/edges
-        if "edges" in graph_data:
-            for edge in graph_data["edges"]:
-                source = edge.get("source", edge.get("from"))
-                target = edge.get("target", edge.get("to"))
-                if source and target:
-                    links.append({
-                        "source": source,
-                        "target": target,
-                        "label": edge.get("relation", edge.get("label", "")),
-                        "weight": edge.get("weight", 1)
-                    })
-        elif "links" in graph_data:
-            links = graph_data["links"]
-        
-        return {
-            "nodes": nodes,
-            "links": links,
-            "stats": {
-                "node_count": len(nodes),
-                "link_count": len(links)
-            }
-        }
-        
-    except json.JSONDecodeError as e:
+        # Converted and serialized once per compiled graph
+        graph_json = _load_cached(graph_file, _GRAPH_CACHE, _build_d3_graph)
+    except orjson.JSONDecodeError as e:
         logger.error(f"Failed to parse knowledge graph: {e}")
         raise HTTPException(status_code=500, detail="Invalid graph data")
     except Exception as e:
         logger.error(f"Error loading graph: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if graph_json is None:
+        raise HTTPException(status_code=404, detail="Knowledge graph not found")
+    
+    return Response(content=graph_json, media_type="application/json")
 
 
 # ===== GET AGENT EXPLAINABILITY =====
@@ -244,12 +297,10 @@ def get_agent_explainability(
     storage_path = Path(agent.storage_path)
     metadata_file = storage_path / "metadata.json"
     
-    if not metadata_file.exists():
-        return {"explainability": None}
-    
     try:
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+        metadata = _load_metadata(metadata_file)
+        if metadata is None:
+            return {"explainability": None}
         
         return {
             "agent_name": agent_name,
@@ -114,9 +114,9 @@ def get_compilation_health(
 def get_embedding_model_status():
     """Check if the embedding model is working"""
     try:
-        from fastembed import TextEmbedding
+        from utils.embedding_model import get_embedding_model
         
-        model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5")
+        model = get_embedding_model()
         test_text = ["Test sentence"]
         embeddings = list(model.embed(test_text))
         
@@ -4,13 +4,20 @@ Builds Vector embeddings from parsed data for semantic retrieval.
 """
 
 import os
-import json
+import uuid
+import hashlib
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional
 from pathlib import Path
+from datetime import datetime
 
+import numpy as np
+import orjson
 from utils.groq_client import get_groq_client, GroqClient
-from fastembed import TextEmbedding
+from utils.embedding_model import EMBEDDING_MODEL_NAME, get_embedding_model
+from sqlalchemy import insert
 from core.database import SessionLocal
 from models.agent import Agent
 from models.chunk import DocumentChunk
@@ -19,6 +26,65 @@ from models.chunk import DocumentChunk
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunks per embedding forward pass
+EMBED_BATCH_SIZE = 64
+
+# Below this many chunks, spawning data-parallel workers (each loading its
+# own model copy) costs more than it saves; ONNX Runtime threading is used
+PARALLEL_EMBED_MIN_CHUNKS = 1000
+
+# Upper bound on the on-disk chunk embedding cache (shared by all compiles);
+# eviction trims back to the low watermark, least recently used first
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_MB", "512")) * 1024 * 1024
+EMBED_CACHE_LOW_WATERMARK = 0.9
+
+# Bytes cached per cache directory, computed lazily on first write
+_embed_cache_bytes: Dict[Path, int] = {}
+_embed_cache_lock = threading.Lock()
+
+# Vector-store writes run off the compile path; embedding inference releases
+# the GIL, so threads are enough
+_vector_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vector-save")
+
+
+def _account_and_evict_embeddings(cache_dir: Path, added_bytes: int):
+    """Track the embedding cache's size and evict the oldest vectors once over budget."""
+    with _embed_cache_lock:
+        cached_bytes = _embed_cache_bytes.get(cache_dir)
+        if cached_bytes is None:
+            cached_bytes = sum(f.stat().st_size for f in cache_dir.glob("??/*.npy"))
+        else:
+            cached_bytes += added_bytes
+        _embed_cache_bytes[cache_dir] = cached_bytes
+        
+        if cached_bytes <= EMBED_CACHE_MAX_BYTES:
+            return
+        
+        target = int(EMBED_CACHE_MAX_BYTES * EMBED_CACHE_LOW_WATERMARK)
+        entries = []
+        for file in cache_dir.glob("??/*.npy"):
+            try:
+                st = file.stat()
+                entries.append((st.st_mtime, st.st_size, file))
+            except OSError:
+                continue
+        entries.sort()
+        
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, file in entries:
+            if total <= target:
+                break
+            try:
+                file.unlink()
+                total -= size
+                evicted += 1
+            except OSError as e:
+                logger.warning(f"Failed to evict cached embedding {file}: {e}")
+        
+        _embed_cache_bytes[cache_dir] = total
+        logger.info(f"Evicted {evicted} cached embeddings, cache now {total} bytes")
+
 
 class KnowledgeCompiler:
     """
@@ -46,15 +112,19 @@ class KnowledgeCompiler:
             "details": {}
         }
         
-        # Initialize embedding model (384 dim default)
+        # Background vector-store write started by the last compile()
+        self._vector_future: Optional[Future] = None
+        
+        # Initialize embedding model (384 dim default, see utils.embedding_model)
+        # Force cache to /tmp for HF Spaces or use env var
+        cache_dir = os.getenv("FASTEMBED_CACHE_PATH", "/tmp/.cache/fastembed")
+        self.embedding_model_name = EMBEDDING_MODEL_NAME
+        
+        # Per-chunk embeddings persisted across compiles, keyed by content hash
+        self._embed_cache_dir = Path(cache_dir) / "embed_cache"
+        
         try:
-            # Force cache to /tmp for HF Spaces or use env var
-            cache_dir = os.getenv("FASTEMBED_CACHE_PATH", "/tmp/.cache/fastembed")
-            self.embedding_model = TextEmbedding(
-                model_name="BAAI/bge-small-en-v1.5", 
-                cache_dir=cache_dir
-            )
-            logger.info(f"FastEmbed model loaded (cache: {cache_dir})")
+            self.embedding_model = get_embedding_model(self.embedding_model_name)
         except Exception as e:
             logger.warning(f"Failed to load embedding model: {e}")
             self.embedding_model = None
@@ -108,12 +178,17 @@ class KnowledgeCompiler:
                 stats=stats
             )
             
-            # Step 5: Save to Vector DB (95%)
+            # Step 5: Save to Vector DB in the background (75% -> 100%)
             if self.embedding_model:
-                self._update_progress("saving_vector", 75, "Saving to Vector Store...")
-                self._save_to_vector_db(agent_name, text_context)
-            
-            self._update_progress("complete", 100, "Compilation complete!")
+                self._update_progress("saving_vector", 75, "Saving to Vector Store in background...")
+                self._vector_future = _vector_executor.submit(
+                    self._save_to_vector_db, agent_name, text_context
+                )
+                self._vector_future.add_done_callback(
+                    lambda _: self._update_progress("complete", 100, "Compilation complete!")
+                )
+            else:
+                self._update_progress("complete", 100, "Compilation complete!")
             
             return {
                 "domain_signature": domain_signature,
@@ -138,7 +213,24 @@ class KnowledgeCompiler:
     
     def get_progress(self) -> Dict[str, Any]:
         """Get current compilation progress."""
-        return self.progress.copy()
+        progress = self.progress.copy()
+        if self._vector_future is None:
+            progress["vector_status"] = "not_started"
+        elif self._vector_future.done():
+            progress["vector_status"] = "complete"
+        else:
+            progress["vector_status"] = "indexing"
+        return progress
+    
+    def wait_for_vector_index(self, timeout: Optional[float] = None) -> None:
+        """
+        Block until the background vector-store write has finished.
+        
+        Args:
+            timeout: Seconds to wait (None waits indefinitely)
+        """
+        if self._vector_future is not None:
+            self._vector_future.result(timeout=timeout)
     
     def _build_text_context(self, parsed_data: List[Dict[str, Any]]) -> str:
         """
@@ -150,51 +242,63 @@ class KnowledgeCompiler:
         Returns:
             Formatted text context
         """
+        # Limit to prevent token overflow (approximately 128K tokens = 500K chars)
+        max_chars = 500000
+        
         context_parts = []
+        total_len = 0
         
+        # Stop pulling parts as soon as the joined text would pass the limit,
+        # rather than building everything and slicing it afterwards
+        for part in self._iter_context_parts(parsed_data):
+            sep = 1 if context_parts else 0
+            if total_len + sep + len(part) > max_chars:
+                remaining = max_chars - total_len - sep
+                if remaining >= 0:
+                    context_parts.append(part[:remaining])
+                logger.warning(f"Text context truncated to {max_chars} characters")
+                return "\n".join(context_parts) + "\n\n[CONTEXT TRUNCATED DUE TO SIZE LIMITS]"
+            context_parts.append(part)
+            total_len += sep + len(part)
+        
+        return "\n".join(context_parts)
+    
+    def _iter_context_parts(self, parsed_data: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield the text context line by line (joined with newlines by the caller)."""
         for i, file_data in enumerate(parsed_data):
             file_name = file_data.get("file_name", file_data.get("source", f"Source_{i+1}"))
             file_format = file_data.get("format", file_data.get("type", "unknown"))
             
-            context_parts.append(f"\n{'='*60}")
-            context_parts.append(f"SOURCE: {file_name} ({file_format.upper()})")
-            context_parts.append(f"{'='*60}\n")
+            yield f"\n{'='*60}"
+            yield f"SOURCE: {file_name} ({file_format.upper()})"
+            yield f"{'='*60}\n"
             
             # Handle structured data (CSV, JSON)
             if file_data.get("data"):
                 for j, entry in enumerate(file_data["data"]):
                     if isinstance(entry, dict):
-                        entry_lines = [f"[Entry {j+1}]"]
+                        # Lines are yielded individually; the final join supplies
+                        # the same newlines a per-entry join would
+                        yield f"[Entry {j+1}]"
                         for key, value in entry.items():
                             if value is not None and str(value).strip():
-                                entry_lines.append(f"  {key}: {value}")
-                        context_parts.append("\n".join(entry_lines))
+                                yield f"  {key}: {value}"
                     else:
-                        context_parts.append(f"[Entry {j+1}] {entry}")
+                        yield f"[Entry {j+1}] {entry}"
             
             # Handle unstructured text (PDF, DOCX, TXT)
             elif file_data.get("text"):
-                context_parts.append(file_data["text"])
+                yield file_data["text"]
             
             # Handle content field
             elif file_data.get("content"):
-                context_parts.append(file_data["content"])
+                yield file_data["content"]
             
             # Handle records field
             elif file_data.get("records"):
                 for j, record in enumerate(file_data["records"]):
                     if record and record.strip():
-                        context_parts.append(f"[Line {j+1}] {record}")
-        
-        text_context = "\n".join(context_parts)
-        
-        # Limit to prevent token overflow (approximately 128K tokens = 500K chars)
-        max_chars = 500000
-        if len(text_context) > max_chars:
-            logger.warning(f"Text context truncated from {len(text_context)} to {max_chars} characters")
-            text_context = text_context[:max_chars] + "\n\n[CONTEXT TRUNCATED DUE TO SIZE LIMITS]"
-        
-        return text_context
+                        yield f"[Line {j+1}] {record}"
     
     def _extract_domain_signature(
         self,
@@ -213,9 +317,13 @@ class KnowledgeCompiler:
         if domain and domain not in signature:
             signature.insert(0, domain)
         
+        # Lowercased keywords already in the signature, for O(1) dedup
+        seen = {s.lower() for s in signature}
+        
         for sub_domain in prompt_analysis.get("sub_domains", []):
-            if sub_domain and sub_domain.lower() not in [s.lower() for s in signature]:
+            if sub_domain and sub_domain.lower() not in seen:
                 signature.append(sub_domain)
+                seen.add(sub_domain.lower())
         
         # Extract column headers from structured data
         for file_data in parsed_data:
@@ -223,8 +331,9 @@ class KnowledgeCompiler:
                 if file_data["data"] and isinstance(file_data["data"][0], dict):
                     for key in file_data["data"][0].keys():
                         clean_key = key.lower().strip().replace("_", " ")
-                        if clean_key and clean_key not in [s.lower() for s in signature]:
+                        if clean_key and clean_key not in seen:
                             signature.append(clean_key)
+                            seen.add(clean_key)
         
         return signature[:80]  # Limit for efficiency
     
@@ -265,19 +374,18 @@ class KnowledgeCompiler:
         metadata = {
             "agent_name": agent_name,
             "system_prompt": system_prompt,
-            "prompt_analysis": prompt_analysis,
+            "prompt_analysis": dict(prompt_analysis),
             "domain_signature": domain_signature,
             "stats": stats,
             "created_at": self._get_timestamp()
         }
-        with open(agent_dir / "metadata.json", "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        with open(agent_dir / "metadata.json", "wb") as f:
+            f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
         
         logger.info(f"Agent saved to: {agent_dir}")
     
     def _get_timestamp(self) -> str:
         """Get current timestamp."""
-        from datetime import datetime
         return datetime.now().isoformat()
     
     def load_agent(self, agent_name: str) -> Dict[str, Any]:
@@ -296,8 +404,7 @@ class KnowledgeCompiler:
             raise FileNotFoundError(f"Agent '{agent_name}' not found")
         
         # Load metadata
-        with open(agent_dir / "metadata.json", "r", encoding="utf-8") as f:
-            metadata = json.load(f)
+        metadata = orjson.loads((agent_dir / "metadata.json").read_bytes())
         
         return {
             "metadata": metadata,
@@ -318,7 +425,7 @@ class KnowledgeCompiler:
             
             # Generate embeddings with error handling
             try:
-                embeddings = list(self.embedding_model.embed(chunks))
+                embeddings = self._embed_chunks(chunks)
                 logger.info(f"Successfully generated {len(embeddings)} embeddings")
             except Exception as embed_error:
                 logger.error(f"Embedding generation failed: {embed_error}")
@@ -339,18 +446,21 @@ class KnowledgeCompiler:
                     logger.warning(f"Failed to delete old chunks: {delete_error}")
                     # Continue anyway
                 
-                # Insert new chunks
+                # Insert new chunks as one bulk INSERT (batched multi-row VALUES)
+                # instead of tracking an ORM object per chunk
                 try:
                     new_chunks = [
-                        DocumentChunk(
-                            agent_id=agent.id,
-                            content=chunk,
-                            embedding=embedding.tolist(),
-                            source="context"
-                        )
+                        {
+                            "agent_id": agent.id,
+                            "content": chunk,
+                            # pgvector's bind processor takes the float32
+                            # array directly; no boxing into a Python list
+                            "embedding": embedding,
+                            "source": "context"
+                        }
                         for chunk, embedding in zip(chunks, embeddings)
                     ]
-                    db.add_all(new_chunks)
+                    db.execute(insert(DocumentChunk), new_chunks)
                     
                     # Update agent's chunk_count
                     agent.chunk_count = len(new_chunks)
@@ -367,20 +477,76 @@ class KnowledgeCompiler:
             # Don't raise - allow compilation to continue even if vector save fails
 
 
+    def _embed_chunks(self, chunks: List[str]) -> List[np.ndarray]:
+        """
+        Embed chunks, reusing vectors cached on disk from earlier compiles.
+        
+        Only chunks whose text (for this model) hasn't been seen before
+        go through the model; results come back in input order.
+        """
+        keys = [
+            hashlib.blake2b(
+                f"{self.embedding_model_name}\0{chunk}".encode("utf-8"), digest_size=16
+            ).hexdigest()
+            for chunk in chunks
+        ]
+        paths = [self._embed_cache_dir / key[:2] / f"{key}.npy" for key in keys]
+        
+        embeddings: List[Optional[np.ndarray]] = [None] * len(chunks)
+        # Each distinct uncached chunk -> every position it appears at
+        misses: Dict[str, List[int]] = {}
+        for i, (key, path) in enumerate(zip(keys, paths)):
+            if key in misses:
+                misses[key].append(i)
+                continue
+            try:
+                embeddings[i] = np.load(path)
+                # Refresh mtime so eviction is least-recently-used
+                os.utime(path)
+            except (OSError, ValueError):
+                misses[key] = [i]
+        
+        if misses:
+            miss_idx = [positions[0] for positions in misses.values()]
+            logger.info(f"Embedding {len(miss_idx)} new chunks ({len(chunks) - len(miss_idx)} reused)")
+            fresh = self.embedding_model.embed(
+                [chunks[i] for i in miss_idx],
+                batch_size=EMBED_BATCH_SIZE,
+                # 0 = one worker per CPU core
+                parallel=0 if len(miss_idx) >= PARALLEL_EMBED_MIN_CHUNKS else None
+            )
+            added_bytes = 0
+            for positions, embedding in zip(misses.values(), fresh):
+                i = positions[0]
+                for j in positions:
+                    embeddings[j] = embedding
+                try:
+                    # Write then rename so concurrent compiles never read a
+                    # partial file; compiles share a process, so the temp
+                    # name is unique per write rather than per pid
+                    paths[i].parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = paths[i].with_suffix(f".{uuid.uuid4().hex}.tmp")
+                    with open(tmp_path, "wb") as f:
+                        np.save(f, embedding)
+                    added_bytes += tmp_path.stat().st_size
+                    os.replace(tmp_path, paths[i])
+                except OSError as e:
+                    logger.warning(f"Failed to cache embedding: {e}")
+            
+            _account_and_evict_embeddings(self._embed_cache_dir, added_bytes)
+        
+        return embeddings
+    
     def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 100) -> List[str]:
         """Simple text chunker."""
-        chunks = []
         if not text:
             return []
         
-        start = 0
-        while start < len(text):
-            end = min(start + chunk_size, len(text))
-            chunks.append(text[start:end])
-            if end == len(text):
-                break
-            start += (chunk_size - overlap)
-        return chunks
+        # Windows start every `step` chars; the last one is the first
+        # window that reaches the end of the text
+        step = chunk_size - overlap
+        last_start = max(0, -(-(len(text) - chunk_size) // step)) * step
+        return [text[start:start + chunk_size] for start in range(0, last_start + 1, step)]
 
     def list_agents(self) -> List[Dict[str, Any]]:
         """List all compiled agents."""
@@ -390,8 +556,7 @@ class KnowledgeCompiler:
             if agent_dir.is_dir():
                 metadata_path = agent_dir / "metadata.json"
                 if metadata_path.exists():
-                    with open(metadata_path, "r", encoding="utf-8") as f:
-                        metadata = json.load(f)
+                    metadata = orjson.loads(metadata_path.read_bytes())
                     agents.append({
                         "name": agent_dir.name,
                         "domain": metadata.get("prompt_analysis", {}).get("domain", "unknown"),
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from models.agent import Agent
 from models.user import User
 from core.config import settings
+from core.cache import invalidate_agent_data
 
 class AgentService:
     def __init__(self):
@@ -78,7 +79,9 @@ class AgentService:
             print(f"Error deleting files for agent {agent.name}: {e}")
             # Continue to delete DB record even if file deletion fails
             
+        agent_id = agent.id
         db.delete(agent)
         db.commit()
+        invalidate_agent_data(agent_name, agent_id)
 
 agent_service = AgentService()
@@ -1,24 +1,27 @@
 
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from datetime import datetime
 from models.user import User
 from core.security import get_password_hash, verify_password, create_access_token
 
 class AuthService:
     def register_user(self, db: Session, email: str, password: str) -> User:
         """Register a new user."""
-        # Check if user exists
-        existing_user = db.query(User).filter(User.email == email).first()
-        if existing_user:
-            raise ValueError("Email already registered")
-        
-        # Create user
+        # Insert and hydrate in one round-trip; the unique constraint on
+        # email rejects duplicates without a separate existence check
         hashed_pw = get_password_hash(password)
-        new_user = User(email=email, password=hashed_pw)
+        try:
+            new_user = db.execute(
+                insert(User).values(email=email, password=hashed_pw).returning(User)
+            ).scalar_one()
+            # Detach so commit doesn't expire the RETURNING-populated attributes
+            db.expunge(new_user)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise ValueError("Email already registered")
         
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
         return new_user
 
     def authenticate_user(self, db: Session, email: str, password: str) -> dict:
@@ -27,8 +30,8 @@ class AuthService:
         if not user or not verify_password(password, user.password):
             return None
         
-        # Update login time
-        user.last_login = datetime.utcnow()
+        # Update login time (server clock, avoids app/DB clock skew)
+        user.last_login = func.now()
         db.commit()
         
         # Create token
@@ -1,5 +1,6 @@
 
 from typing import List, Optional
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -58,12 +59,10 @@ class ConversationService:
         
         db.add(message)
         
-        # Update conversation timestamp
-        conversation = db.query(Conversation).filter(
+        # Update conversation timestamp in place, without loading the row
+        db.query(Conversation).filter(
             Conversation.id == conversation_id
-        ).first()
-        if conversation:
-            conversation.updated_at = datetime.utcnow()
+        ).update({Conversation.updated_at: datetime.utcnow()}, synchronize_session=False)
         
         db.commit()
         db.refresh(message)
@@ -117,9 +116,16 @@ class ConversationService:
         user_id: int
     ) -> List[dict]:
         """List all conversations for a user."""
-        conversations = db.query(Conversation).filter(
+        # Count messages in the same query instead of lazy-loading
+        # every conversation's messages
+        rows = db.query(
+            Conversation,
+            func.count(Message.id).label("message_count")
+        ).outerjoin(
+            Message, Message.conversation_id == Conversation.id
+        ).filter(
             Conversation.user_id == user_id
-        ).order_by(Conversation.updated_at.desc()).all()
+        ).group_by(Conversation.id).order_by(Conversation.updated_at.desc()).all()
         
         return [
             {
@@ -127,9 +133,9 @@ class ConversationService:
                 "agent_id": conv.agent_id,
                 "created_at": conv.created_at,
                 "updated_at": conv.updated_at,
-                "message_count": len(conv.messages)
+                "message_count": message_count
             }
-            for conv in conversations
+            for conv, message_count in rows
         ]
     
     def delete_conversation(self, db: Session, conversation_id: int, user_id: int) -> bool:
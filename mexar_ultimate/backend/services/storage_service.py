@@ -8,6 +8,7 @@ import logging
 from typing import Optional
 from pathlib import Path
 import uuid
+import httpx
 from fastapi import UploadFile, HTTPException
 from supabase import create_client, Client
 
@@ -15,6 +16,9 @@ from supabase import create_client, Client
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bytes read from an upload per streamed chunk
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 
 class StorageService:
     """Service for managing file uploads to Supabase Storage."""
@@ -28,6 +32,15 @@ class StorageService:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
         
         self.client: Client = create_client(supabase_url, supabase_key)
+        
+        # Uploads go straight to the Storage REST API so the body can be
+        # streamed instead of buffered in memory
+        self._object_url = f"{supabase_url.rstrip('/')}/storage/v1/object"
+        self._auth_headers = {
+            "Authorization": f"Bearer {supabase_key}",
+            "apikey": supabase_key
+        }
+        self._http = httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0))
         logger.info("Supabase Storage client initialized")
     
     async def upload_file(
@@ -56,17 +69,36 @@ class StorageService:
             filename = f"{uuid.uuid4()}{ext}"
             path = f"{folder}/{filename}" if folder else filename
             
-            # Read file content
-            content = await file.read()
-            file_size = len(content)
+            # Stream the file in fixed-size chunks, counting bytes as they go
+            file_size = 0
+            
+            async def stream_content():
+                nonlocal file_size
+                # Callers may already have read the file
+                await file.seek(0)
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    yield chunk
             
             # Upload to Supabase
             logger.info(f"Uploading file to {bucket}/{path}")
-            response = self.client.storage.from_(bucket).upload(
-                path=path,
-                file=content,
-                file_options={"content-type": file.content_type or "application/octet-stream"}
+            response = await self._http.post(
+                f"{self._object_url}/{bucket}/{path}",
+                headers={
+                    **self._auth_headers,
+                    "Content-Type": file.content_type or "application/octet-stream",
+                    "x-upsert": "false"
+                },
+                content=stream_content()
             )
+            if not response.is_success:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Supabase Storage error: {response.status_code} - {response.text}"
+                )
             
             # Get public URL (works for public buckets)
             public_url = self.client.storage.from_(bucket).get_public_url(path)
@@ -81,6 +113,8 @@ class StorageService:
                 "original_filename": file.filename
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error uploading file to Supabase Storage: {str(e)}")
             raise HTTPException(
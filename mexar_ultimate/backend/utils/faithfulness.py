@@ -2,13 +2,140 @@
 MEXAR - Faithfulness Scoring Module
 Measures how well the LLM answer is grounded in the retrieved context.
 """
+import re
 import json
+import hashlib
 import logging
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Set, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+
+from core.cache import SemanticCache
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_model import EMBEDDING_MODEL_NAME, embed_matrix, get_embedding_model
+
 logger = logging.getLogger(__name__)
 
+# Per-claim support checks are independent Groq round-trips; when the
+# batched check can't be used they run concurrently here
+_claim_check_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="claim-check")
+
+# Claims are extracted from, and checked against, only this much of the
+# answer and context
+ANSWER_EXTRACT_CHARS = 2000
+CONTEXT_CHECK_CHARS = 4000
+
+# Claims at least this similar to an already-checked one (against the same
+# context) reuse its verdict instead of asking the LLM again
+VERDICT_CACHE_THRESHOLD = 0.95
+
+# Contexts whose claim verdicts are remembered
+VERDICT_CACHE_CONTEXTS = 64
+
+# Sentence-ending punctuation followed by whitespace
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Significant words for the overlap estimate (5+ word characters)
+_SIGNIFICANT_WORD = re.compile(r"\w{5,}")
+
+# Claims with more than this share of their content-word trigrams found in
+# the context restate it closely enough to count as supported without an
+# LLM check
+LEXICAL_SUPPORT_THRESHOLD = 0.7
+
+_WORD = re.compile(r"\w+")
+
+# List and heading markers in front of claims ("- ", "2. ", "## ")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)]|#+)\s+")
+
+# Sentences split locally need this many words to count as a claim
+MIN_CLAIM_WORDS = 5
+
+# Answers up to this long are scored on a single locally split claim;
+# longer ones need at least two, or the LLM extracts claims instead
+SHORT_ANSWER_CHARS = 300
+
+# Function words skipped when building trigrams (negations are kept, so
+# "is not X" never matches "is X")
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "to", "in", "on", "at", "by", "for", "with",
+    "from", "as", "and", "or", "is", "are", "was", "were", "be", "been",
+    "it", "its", "this", "that", "these", "those"
+})
+
+_verdict_caches: "OrderedDict[str, SemanticCache]" = OrderedDict()
+_verdict_caches_lock = threading.Lock()
+
+
+def _embed_claim(claim: str) -> np.ndarray:
+    """Embed a claim with the shared model (raises if it can't be loaded)."""
+    return get_embedding_cache().embed(
+        EMBEDDING_MODEL_NAME,
+        [claim],
+        lambda texts: embed_matrix(get_embedding_model(), texts)
+    )[0]
+
+
+def _truncate_at_word(text: str, limit: int) -> str:
+    """Cut text to at most `limit` chars, without splitting the last word."""
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut] if cut > 0 else text[:limit]
+
+
+def _content_trigrams(text: str) -> List[Tuple[str, str, str]]:
+    """Consecutive triples of the lowercased non-stopword words in text."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+    return list(zip(words, words[1:], words[2:]))
+
+
+def _is_lexically_supported(claim: str, context_trigrams: Set[Tuple[str, str, str]]) -> bool:
+    """Whether the claim's wording is mostly found verbatim in the context."""
+    trigrams = _content_trigrams(claim)
+    if not trigrams:
+        return False
+    found = sum(1 for trigram in trigrams if trigram in context_trigrams)
+    return found / len(trigrams) > LEXICAL_SUPPORT_THRESHOLD
+
+
+def _clean_claim_line(line: str) -> str:
+    """A claim as listed by the LLM, without list markers or quotes."""
+    return _LIST_MARKER.sub("", line).strip().strip('"')
+
+
+def _split_claims(answer: str) -> List[str]:
+    """Split the answer's sentences and list items into candidate claims."""
+    claims = []
+    for line in _truncate_at_word(answer, ANSWER_EXTRACT_CHARS).splitlines():
+        for sentence in _SENTENCE_BOUNDARY.split(_clean_claim_line(line)):
+            sentence = sentence.strip()
+            # Questions, headings ("Key points:") and fragments assert nothing
+            if sentence.endswith(("?", ":")) or len(sentence.split()) < MIN_CLAIM_WORDS:
+                continue
+            claims.append(sentence)
+    return claims
+
+
+def _verdict_cache(checked_context: str) -> SemanticCache:
+    """Get the claim verdict cache for a context, evicting the least recent one."""
+    key = hashlib.sha256(checked_context.encode("utf-8")).hexdigest()
+    with _verdict_caches_lock:
+        verdicts = _verdict_caches.get(key)
+        if verdicts is None:
+            verdicts = _verdict_caches[key] = SemanticCache(
+                _embed_claim, threshold=VERDICT_CACHE_THRESHOLD
+            )
+            if len(_verdict_caches) > VERDICT_CACHE_CONTEXTS:
+                _verdict_caches.popitem(last=False)
+        else:
+            _verdict_caches.move_to_end(key)
+        return verdicts
+
 
 @dataclass
 class FaithfulnessResult:
@@ -67,8 +194,27 @@ class FaithfulnessScorer:
                 unsupported_claims=[]
             )
         
-        # Step 1: Extract claims from answer
-        claims = self._extract_claims(answer)
+        # The checks only see the start of the context, so it is cut once
+        # here; its trigrams are hashed once for the lexical check
+        checked_context = _truncate_at_word(context, CONTEXT_CHECK_CHARS)
+        context_trigrams = set(_content_trigrams(checked_context))
+        verdict_cache = _verdict_cache(checked_context)
+        
+        # Step 1: Extract claims from answer, checking each one locally
+        # (lexical match, verdict cache) while the rest are still streaming.
+        # Answers often restate a point; each distinct claim (ignoring case
+        # and whitespace) is checked once and its verdict shared
+        claims = []
+        claim_keys = []
+        local_checks = {}
+        for claim in self._iter_claims(answer):
+            key = " ".join(claim.lower().split())
+            claims.append(claim)
+            claim_keys.append(key)
+            if key not in local_checks:
+                local_checks[key] = (claim, _claim_check_executor.submit(
+                    self._check_locally, claim, context_trigrams, verdict_cache
+                ))
         
         if not claims:
             return FaithfulnessResult(
@@ -78,12 +224,20 @@ class FaithfulnessScorer:
                 unsupported_claims=[]
             )
         
-        # Step 2: Check each claim against context
+        # Step 2: Check the claims not settled locally in one LLM call
+        verdicts = {key: check.result() for key, (_, check) in local_checks.items()}
+        unchecked = [key for key, verdict in verdicts.items() if verdict is None]
+        if unchecked:
+            fresh = self._check_claims(
+                [local_checks[key][0] for key in unchecked], checked_context, verdict_cache
+            )
+            verdicts.update(zip(unchecked, fresh))
+        
         supported = 0
         unsupported = []
         
-        for claim in claims:
-            if self._is_supported(claim, context):
+        for claim, key in zip(claims, claim_keys):
+            if verdicts[key]:
                 supported += 1
             else:
                 unsupported.append(claim)
@@ -100,53 +254,135 @@ class FaithfulnessScorer:
             unsupported_claims=unsupported[:5]  # Limit to 5 for display
         )
     
-    def _extract_claims(self, answer: str) -> List[str]:
+    def _iter_claims(self, answer: str) -> Iterator[str]:
         """
-        Extract factual claims from the answer.
+        Yield the answer's factual claims.
         
-        Uses LLM to identify distinct factual statements.
+        Its declarative sentences and list items are used directly when
+        there are enough of them; otherwise the LLM extracts claims.
         """
-        try:
-            prompt = f"""Extract individual factual claims from this answer. 
+        claims = _split_claims(answer)
+        if len(claims) >= 2 or (claims and len(answer) <= SHORT_ANSWER_CHARS):
+            return iter(claims)
+        return self._stream_claims(answer)
+    
+    def _stream_claims(self, answer: str) -> Iterator[str]:
+        """
+        Extract factual claims from the answer, yielding each one as soon
+        as the LLM has finished writing it.
+        
+        The LLM lists one claim per line, so claims complete while the
+        response streams. Falls back to sentence splitting if the call
+        fails before producing any claim.
+        """
+        prompt = f"""Extract individual factual claims from this answer. 
 A claim is a specific statement that can be verified as true or false.
-Return ONLY a JSON array of strings, no explanation.
+Return ONLY the claims, one per line, with no numbering or explanation.
+
+Answer: "{_truncate_at_word(answer, ANSWER_EXTRACT_CHARS)}\""""
+        
+        messages = [
+            {"role": "system", "content": "You extract factual claims. Return one claim per line."},
+            {"role": "user", "content": prompt}
+        ]
+        
+        produced = False
+        try:
+            pending = ""
+            for piece in self.client.stream_chat_completion(messages, model="fast"):
+                *lines, pending = (pending + piece).split("\n")
+                for line in lines:
+                    claim = _clean_claim_line(line)
+                    if claim:
+                        produced = True
+                        yield claim
+            claim = _clean_claim_line(pending)
+            if claim:
+                produced = True
+                yield claim
+        except Exception as e:
+            logger.warning(f"Claim extraction failed: {e}")
+            if not produced:
+                yield from self._fallback_extract_claims(answer)
+    
+    def _fallback_extract_claims(self, answer: str) -> List[str]:
+        """Fallback claim extraction by splitting sentences."""
+        sentences = _SENTENCE_BOUNDARY.split(answer)
+        # Filter to substantive sentences
+        return [s.strip() for s in sentences if len(s.strip()) > 20][:10]
+    
+    def _check_locally(
+        self,
+        claim: str,
+        context_trigrams: Set[Tuple[str, str, str]],
+        verdict_cache: SemanticCache
+    ) -> Optional[bool]:
+        """
+        Settle a claim without the LLM, if possible.
+        
+        Claims that restate the context nearly word for word are supported
+        outright, and claims that paraphrase one already checked against the
+        same context reuse its verdict.
+        
+        Returns:
+            The verdict, or None if the claim needs an LLM check
+        """
+        if _is_lexically_supported(claim, context_trigrams):
+            return True
+        return verdict_cache.lookup(claim)
+    
+    def _check_claims(
+        self,
+        claims: List[str],
+        context: str,
+        verdict_cache: SemanticCache
+    ) -> List[bool]:
+        """
+        Check claims against the context with a single LLM call.
+        
+        Verdicts parsed from the response are stored in verdict_cache. Falls
+        back to checking claims individually (concurrently, uncached) if the
+        verdicts can't be parsed or don't line up with the claims.
+        """
+        numbered = "\n".join(f"{i}. {claim}" for i, claim in enumerate(claims, 1))
+        prompt = f"""For each numbered claim, decide whether it is supported by the context.
 
-Answer: "{answer[:2000]}"
+Claims:
+{numbered}
 
-Example output: ["Claim 1", "Claim 2", "Claim 3"]"""
+Context (first 4000 chars):
+"{context}"
 
+Answer YES if the context contains information that supports the claim.
+Answer NO if the claim cannot be verified from the context or contradicts it.
+Return ONLY a JSON object with one verdict per claim, in order: {{"verdicts": ["YES", "NO", ...]}}"""
+        
+        try:
             response = self.client.analyze_with_system_prompt(
-                system_prompt="You extract factual claims. Return only valid JSON array.",
+                system_prompt="You verify claims. Return only valid JSON.",
                 user_message=prompt,
                 model="fast",
                 json_mode=True
             )
-            
-            # Parse response
-            claims = json.loads(response)
-            
-            # Handle both list and dict responses
-            if isinstance(claims, list):
-                return [str(c) for c in claims if c]
-            elif isinstance(claims, dict):
-                return [str(c) for c in claims.get("claims", claims.get("statements", [])) if c]
-            
-            return []
-            
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse claims JSON: {e}")
-            # Fallback: split by sentences
-            return self._fallback_extract_claims(answer)
         except Exception as e:
-            logger.warning(f"Claim extraction failed: {e}")
-            return self._fallback_extract_claims(answer)
-    
-    def _fallback_extract_claims(self, answer: str) -> List[str]:
-        """Fallback claim extraction by splitting sentences."""
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', answer)
-        # Filter to substantive sentences
-        return [s.strip() for s in sentences if len(s.strip()) > 20][:10]
+            logger.warning(f"Support check failed: {e}")
+            # Optimistic fallback - assume supported if check fails
+            return [True] * len(claims)
+        
+        try:
+            verdicts = json.loads(response)
+            if isinstance(verdicts, dict):
+                verdicts = verdicts.get("verdicts")
+            if isinstance(verdicts, list) and len(verdicts) == len(claims):
+                verdicts = [v is True or "YES" in str(v).upper() for v in verdicts]
+                for claim, verdict in zip(claims, verdicts):
+                    verdict_cache.update(claim, verdict)
+                return verdicts
+            logger.warning("Batched support check returned mismatched verdicts, checking claims individually")
+        except json.JSONDecodeError as e:
+            logger.warning(f"Failed to parse verdicts JSON: {e}")
+        
+        return list(_claim_check_executor.map(lambda claim: self._is_supported(claim, context), claims))
     
     def _is_supported(self, claim: str, context: str) -> bool:
         """
@@ -160,7 +396,7 @@ Example output: ["Claim 1", "Claim 2", "Claim 3"]"""
 Claim: "{claim}"
 
 Context (first 4000 chars):
-"{context[:4000]}"
+"{context}"
 
 Answer YES if the context contains information that supports this claim.
 Answer NO if the claim cannot be verified from the context or contradicts it."""
@@ -194,15 +430,15 @@ Answer NO if the claim cannot be verified from the context or contradicts it."""
             return 0.5
         
         # Get significant words from answer
-        answer_words = set(w.lower() for w in answer.split() if len(w) > 4)
-        context_lower = context.lower()
+        answer_words = set(_SIGNIFICANT_WORD.findall(answer.lower()))
         
         if not answer_words:
             return 0.5
         
-        # Check how many answer words appear in context
-        found = sum(1 for w in answer_words if w in context_lower)
-        overlap = found / len(answer_words)
+        # Tokenize the context once; each answer word is then a hash lookup
+        # rather than a substring scan of the whole context
+        context_words = set(_SIGNIFICANT_WORD.findall(context.lower()))
+        overlap = len(answer_words & context_words) / len(answer_words)
         
         # Scale to reasonable range
         return min(1.0, overlap * 1.5)
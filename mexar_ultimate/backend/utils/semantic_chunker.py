@@ -3,7 +3,10 @@ MEXAR - Semantic Chunking Module
 Smart chunking that preserves semantic units for better retrieval.
 """
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+
+# Paragraph boundaries: double newlines or multiple newlines
+_PARA_RE = re.compile(r'\n\s*\n')
 
 
 class SemanticChunker:
@@ -39,14 +42,14 @@ class SemanticChunker:
         if not text or not text.strip():
             return []
         
-        paragraphs = self._split_paragraphs(text)
+        # Count each paragraph once; counts are reused for the overlap
+        paragraphs = [(p, self._count_tokens(p)) for p in self._split_paragraphs(text)]
         chunks = []
         current_chunk = []
         current_tokens = 0
+        last_para_tokens = 0
         
-        for para in paragraphs:
-            para_tokens = self._count_tokens(para)
-            
+        for para, para_tokens in paragraphs:
             # If adding this paragraph exceeds target and we have content, save chunk
             if current_tokens + para_tokens > self.target_tokens and current_chunk:
                 chunk_text = "\n\n".join(current_chunk)
@@ -61,13 +64,14 @@ class SemanticChunker:
                 if current_chunk:
                     last_para = current_chunk[-1]
                     current_chunk = [last_para]
-                    current_tokens = self._count_tokens(last_para)
+                    current_tokens = last_para_tokens
                 else:
                     current_chunk = []
                     current_tokens = 0
             
             current_chunk.append(para)
             current_tokens += para_tokens
+            last_para_tokens = para_tokens
         
         # Don't forget the last chunk
         if current_chunk:
@@ -80,62 +84,46 @@ class SemanticChunker:
         
         return chunks
     
-    def chunk_structured_data(self, data: List[Dict], source: str) -> List[Dict[str, Any]]:
+    def chunk_structured_data(self, data: List[Dict], source: str) -> Iterator[Dict[str, Any]]:
         """
         Convert structured data (CSV/JSON rows) into searchable chunks.
-        Each row becomes a self-contained, readable chunk.
+        Each row becomes a self-contained, readable chunk; chunks are yielded
+        one at a time so large ingests are never held in memory at once.
         
         Args:
             data: List of dictionaries (rows)
             source: Source file name
             
-        Returns:
-            List of chunk dictionaries
+        Yields:
+            Chunk dictionaries
         """
-        chunks = []
-        
         for i, row in enumerate(data):
             if not isinstance(row, dict):
                 continue
             
-            # Format row as readable text with context
-            content_parts = [f"Entry {i+1} from {source}:"]
-            
-            for key, value in row.items():
-                if value is not None and str(value).strip():
-                    # Clean up the key name for readability
-                    clean_key = str(key).replace("_", " ").title()
-                    content_parts.append(f"  {clean_key}: {value}")
+            # Format row as readable text with context, cleaning up key names
+            content = "\n".join(
+                f"  {str(key).replace('_', ' ').title()}: {value}"
+                for key, value in row.items()
+                if value is not None and str(value).strip()
+            )
+            header = f"Entry {i+1} from {source}:"
+            content = f"{header}\n{content}" if content else header
             
-            content = "\n".join(content_parts)
-            
-            chunks.append({
+            yield {
                 "content": content,
                 "source": f"{source}, Entry {i+1}",
                 "token_count": self._count_tokens(content),
-                "chunk_index": i,
-                "row_data": row  # Keep original data for reference
-            })
-        
-        return chunks
+                "chunk_index": i
+            }
     
     def _split_paragraphs(self, text: str) -> List[str]:
-        """Split text into paragraphs."""
-        # Split on double newlines or multiple newlines
-        paragraphs = re.split(r'\n\s*\n', text)
-        
-        # Clean and filter empty paragraphs
-        cleaned = []
-        for p in paragraphs:
-            p = p.strip()
-            if p:
-                cleaned.append(p)
-        
-        return cleaned
+        """Split text into paragraphs, dropping empty ones."""
+        return [para for p in _PARA_RE.split(text) if (para := p.strip())]
     
     def _count_tokens(self, text: str) -> int:
         """Approximate token count (roughly 4 chars per token)."""
-        return len(text.split())
+        return len(text) >> 2
 
 
 def create_semantic_chunker(target_tokens: int = 400) -> SemanticChunker: